@@ -0,0 +1,156 @@
+import time
+from typing import TYPE_CHECKING
+
+from app.agent.vad_constants import SAMPLE_RATE, CHANNELS, BYTES_PER_SAMPLE
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# NumPy and the resampler are imported by the first converter that has to convert, so
+# importing the server (and the 16 kHz mono int16 passthrough path) does not load NumPy.
+
+# Sample formats a client may declare at connect time, mapped to their NumPy dtype.
+SUPPORTED_SAMPLE_FORMATS = {
+    "int16": "<i2",
+    "float32": "<f4",
+}
+TARGET_SAMPLE_FORMAT = "int16"
+
+MIN_INPUT_SAMPLE_RATE = 8000
+MAX_INPUT_SAMPLE_RATE = 192000
+MAX_INPUT_CHANNELS = 8
+
+
+class AudioInputConverter:
+    """Converts client audio in its declared format to the VAD's 16 kHz mono int16 PCM.
+
+    A single converter is created per connection. It keeps partial sample frames
+    that were split across WebSocket messages and the resampler state, so chunks
+    can be fed in as they arrive.
+    """
+
+    def __init__(
+            self,
+            session_id: str,
+            sample_rate: int = SAMPLE_RATE,
+            channels: int = CHANNELS,
+            sample_format: str = TARGET_SAMPLE_FORMAT
+    ):
+        self.session_id = session_id
+        if sample_format not in SUPPORTED_SAMPLE_FORMATS:
+            raise ValueError(
+                f"Unsupported sample format '{sample_format}'. "
+                f"Expected one of: {', '.join(SUPPORTED_SAMPLE_FORMATS)}"
+            )
+        if not MIN_INPUT_SAMPLE_RATE <= sample_rate <= MAX_INPUT_SAMPLE_RATE:
+            raise ValueError(f"Unsupported sample rate {sample_rate} Hz.")
+        if not 0 < channels <= MAX_INPUT_CHANNELS:
+            raise ValueError(f"Unsupported channel count {channels}.")
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.passthrough = (
+                sample_rate == SAMPLE_RATE and channels == CHANNELS and sample_format == TARGET_SAMPLE_FORMAT
+        )
+        self.resampler = None
+        self._pending = bytearray()
+
+        if not self.passthrough:
+            import numpy as np
+            from app.agent.resampler import PolyphaseResampler
+
+            self.dtype = np.dtype(SUPPORTED_SAMPLE_FORMATS[sample_format])
+            self.bytes_per_input_frame = self.dtype.itemsize * channels
+            if sample_rate != SAMPLE_RATE:
+                self.resampler = PolyphaseResampler(sample_rate, SAMPLE_RATE)
+            self._mono = np.empty(0, dtype=np.float32)
+            self._pcm = np.empty(0, dtype=np.int16)
+        print(
+            f"Audio input for Client #{self.session_id}: {sample_rate}Hz, {channels}ch, {sample_format} "
+            f"-> {SAMPLE_RATE}Hz, {CHANNELS}ch, {TARGET_SAMPLE_FORMAT}"
+            f"{' (passthrough)' if self.passthrough else ''}."
+        )
+
+    def convert(self, audio_chunk: bytes) -> bytes:
+        """Returns the chunk as 16 kHz mono int16 PCM (possibly empty while buffering)."""
+        if self.passthrough:
+            return audio_chunk
+
+        self._pending.extend(audio_chunk)
+        num_frames = len(self._pending) // self.bytes_per_input_frame
+        if num_frames == 0:
+            return b""
+        usable = num_frames * self.bytes_per_input_frame
+
+        mono = self._downmix(num_frames)
+        del self._pending[:usable]
+
+        if self.resampler is None:
+            return self._to_pcm16(mono)
+        block = self.resampler.block_size
+        if num_frames <= block:
+            return self._to_pcm16(self.resampler.process(mono))
+        return b"".join(
+            self._to_pcm16(self.resampler.process(mono[i:i + block])) for i in range(0, num_frames, block)
+        )
+
+    def _downmix(self, num_frames: int) -> "np.ndarray":
+        """Decodes complete frames from the pending bytes into normalised mono float32."""
+        import numpy as np
+
+        if len(self._mono) < num_frames:
+            self._mono = np.empty(max(num_frames, 2 * len(self._mono)), dtype=np.float32)
+        mono = self._mono[:num_frames]
+
+        raw = np.frombuffer(self._pending, dtype=self.dtype, count=num_frames * self.channels)
+        if self.channels == 1:
+            mono[:] = raw
+        else:
+            np.sum(raw.reshape(num_frames, self.channels), axis=1, out=mono, dtype=np.float32)
+            mono *= 1.0 / self.channels
+        if self.sample_format == "int16":
+            mono *= 1.0 / 32768.0
+        return mono
+
+    def _to_pcm16(self, samples: "np.ndarray") -> bytes:
+        import numpy as np
+
+        count = len(samples)
+        if len(self._pcm) < count:
+            self._pcm = np.empty(max(count, 2 * len(self._pcm)), dtype=np.int16)
+        np.clip(samples, -1.0, 32767.0 / 32768.0, out=samples)
+        samples *= 32768.0
+        pcm = self._pcm[:count]
+        np.rint(samples, out=samples)
+        pcm[:] = samples
+        return pcm.tobytes()
+
+
+def _benchmark(seconds: float = 20.0, chunk_ms: int = 20):
+    """Single-core throughput for 48 kHz stereo float32 input, chunked like a live mic."""
+    import numpy as np
+
+    input_rate, channels = 48000, 2
+    frames_per_chunk = input_rate * chunk_ms // 1000
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(int(input_rate * seconds) * channels) * 0.1).astype(np.float32)
+    chunk_bytes = frames_per_chunk * channels * 4
+    payload = audio.tobytes()
+
+    converter = AudioInputConverter("benchmark", input_rate, channels, "float32")
+    produced = 0
+    start = time.perf_counter()
+    for offset in range(0, len(payload), chunk_bytes):
+        produced += len(converter.convert(payload[offset:offset + chunk_bytes]))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{seconds:.0f}s of {input_rate}Hz {channels}ch float32 in {chunk_ms}ms chunks: "
+        f"{elapsed * 1000:.1f}ms, {seconds / elapsed:.0f}x realtime per core, "
+        f"{produced // BYTES_PER_SAMPLE} output samples."
+    )
+
+
+if __name__ == "__main__":
+    _benchmark()
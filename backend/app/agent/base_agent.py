@@ -1,7 +1,10 @@
 import re
-from pypdf import PdfReader
-from google.adk.agents import Agent
-from google.adk.tools import google_search
+from functools import lru_cache
+from app.agent.recognition_constants import STREAMING_MODEL
+from app.agent.shared_state import shared_store, file_version
+
+# google.adk and pypdf are imported where they are first used: they dominate server
+# import time and are not needed to accept connections.
 
 
 # Simplified PDF Processor
@@ -12,6 +15,8 @@ class PDFProcessor:
 
     def process_pdf(self):
         """Extract all text from PDF"""
+        from pypdf import PdfReader
+
         reader = PdfReader(self.file_path)
         self.full_text = "\n".join([page.extract_text() for page in reader.pages])
 
@@ -20,15 +25,55 @@ class PDFProcessor:
         self.full_text = self.full_text.strip()
 
 
+def load_document_text(pdf_path: str) -> str:
+    """Extracted text of `pdf_path`, parsed once per host and shared by all workers.
+
+    The cache key includes the file's size and mtime, so an edited document is parsed
+    again by the first worker that asks for it.
+    """
+    return _load_document_text(pdf_path, file_version(pdf_path))
+
+
+@lru_cache(maxsize=8)
+def _load_document_text(pdf_path: str, version: str) -> str:
+    def parse() -> bytes:
+        proc = PDFProcessor(pdf_path)
+        proc.process_pdf()
+        return proc.full_text.encode("utf-8")
+
+    return shared_store("documents").get_or_create(version, parse).decode("utf-8")
+
+
 # Modified Agent with Full Document Context
-root_agent = Agent(
-    name="document_agent",
-    model="gemini-2.0-flash-exp",
-    description="Agent that uses full document context",
-    instruction=lambda session: (
-        # Access document_text from session.metadata
-        f"Use this document context to answer questions:\n{session.state.get('document_text', '')}\n\n" # Ensure .get() for safety
-        "Respond in clear, natural sentences without markdown. "
-    ),
-    tools=[google_search]  # Optional: Keep web search as fallback
-)
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_root_agent():
+    from google.adk.agents import Agent
+    from google.adk.tools import google_search
+
+    return Agent(
+        name="document_agent",
+        model="gemini-2.0-flash-exp",
+        description="Agent that uses full document context",
+        instruction=lambda session: (
+            # Access document_text from session.metadata
+            f"Use this document context to answer questions:\n{session.state.get('document_text', '')}\n\n" # Ensure .get() for safety
+            "Respond in clear, natural sentences without markdown. "
+        ),
+        tools=[google_search]  # Optional: Keep web search as fallback
+    )
+
+
+# Live agent used only for streaming speech recognition; its input transcription is the product.
+@lru_cache(maxsize=None)
+def get_transcription_agent():
+    from google.adk.agents import Agent
+
+    return Agent(
+        name="transcription_agent",
+        model=STREAMING_MODEL,
+        description="Agent that transcribes streamed user speech",
+        instruction=(
+            "Transcribe the user's speech verbatim. "
+            "Reply with the transcript only and never answer the question."
+        )
+    )
@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import mmap
+import time
+import uuid
+import struct
+from typing import Iterator
+
+# Capture file layout: an 8-byte magic, then back-to-back records of
+#   kind (u8) | seconds since capture start (f64) | payload length (u32) | payload
+# all little-endian. Each file holds one connection and is only ever appended to, so a
+# capture cut short by a crash or by the size cap is still readable up to its last
+# complete record.
+CAPTURE_MAGIC = b"GDGCAP\x00\x01"
+RECORD_HEADER = struct.Struct("<BdI")
+
+RECORD_META = 0  # JSON: session id, endpoint, declared input format, wall-clock start
+RECORD_AUDIO_IN = 1  # raw bytes exactly as received from the client
+RECORD_VAD = 2  # JSON: {"event": "speech_start" | "speech_end" | "discard", ...}
+RECORD_TRANSCRIPT = 3  # UTF-8 transcript text
+RECORD_OUTBOUND_AUDIO = 4  # u32 length of an outbound audio blob (audio itself not stored)
+RECORD_OUTBOUND_EVENT = 5  # JSON: outbound text/events sent to the client
+
+RECORD_NAMES = {
+    RECORD_META: "meta",
+    RECORD_AUDIO_IN: "audio_in",
+    RECORD_VAD: "vad",
+    RECORD_TRANSCRIPT: "transcript",
+    RECORD_OUTBOUND_AUDIO: "outbound_audio",
+    RECORD_OUTBOUND_EVENT: "outbound_event",
+}
+
+# Recording is off unless the operator sets the directory; `capture=true` from a client
+# is only honoured on servers that opted in.
+CAPTURE_DIR_ENV = "STREAM_CAPTURE_DIR"
+CAPTURE_MAX_BYTES_ENV = "STREAM_CAPTURE_MAX_BYTES"
+DEFAULT_CAPTURE_MAX_BYTES = 64 * 1024 * 1024  # about 35 minutes of 16 kHz mono PCM
+
+_UNSAFE_FILE_NAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class CaptureWriter:
+    """Append-only recorder of one session's traffic."""
+
+    def __init__(self, path: str, meta: dict, max_bytes: int = DEFAULT_CAPTURE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Exclusive create: a second writer must never interleave records into this file.
+        self._file = open(path, "xb")
+        self._file.write(CAPTURE_MAGIC)
+        self._bytes_written = len(CAPTURE_MAGIC)
+        self._start = time.monotonic()
+        self.record_json(RECORD_META, {**meta, "wall_clock_start": time.time()})
+        print(f"Capture: Recording session to {path}.")
+
+    @classmethod
+    def for_session(cls, session_id: str, endpoint: str, **meta) -> "CaptureWriter | None":
+        """Opens a new capture file for the session, or returns None when capture is not enabled."""
+        # Read per call so .env, loaded after the app is imported, can set them.
+        capture_dir = os.getenv(CAPTURE_DIR_ENV)
+        if not capture_dir:
+            return None
+        max_bytes = int(os.getenv(CAPTURE_MAX_BYTES_ENV, DEFAULT_CAPTURE_MAX_BYTES))
+        safe_id = _UNSAFE_FILE_NAME_CHARS.sub("_", session_id)
+        file_name = f"{endpoint}-{safe_id}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.cap"
+        return cls(
+            os.path.join(capture_dir, file_name),
+            {"session_id": session_id, "endpoint": endpoint, **meta},
+            max_bytes
+        )
+
+    def record(self, kind: int, payload: bytes) -> None:
+        if self._file.closed:
+            return
+        size = RECORD_HEADER.size + len(payload)
+        if self._bytes_written + size > self.max_bytes:
+            print(f"Capture: {self.path} reached {self.max_bytes} bytes, recording stopped.")
+            self.close()
+            return
+        self._file.write(RECORD_HEADER.pack(kind, time.monotonic() - self._start, len(payload)))
+        self._file.write(payload)
+        self._bytes_written += size
+
+    def record_json(self, kind: int, data: dict) -> None:
+        self.record(kind, json.dumps(data).encode("utf-8"))
+
+    def record_audio_in(self, audio_chunk: bytes) -> None:
+        self.record(RECORD_AUDIO_IN, audio_chunk)
+
+    def record_vad(self, event: str, **details) -> None:
+        self.record_json(RECORD_VAD, {"event": event, **details})
+
+    def record_transcript(self, transcript: str) -> None:
+        self.record(RECORD_TRANSCRIPT, transcript.encode("utf-8"))
+
+    def record_outbound_audio(self, audio: bytes) -> None:
+        self.record(RECORD_OUTBOUND_AUDIO, struct.pack("<I", len(audio)))
+
+    def record_outbound_event(self, event: dict) -> None:
+        self.record_json(RECORD_OUTBOUND_EVENT, event)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            print(f"Capture: Closed {self.path}.")
+
+
+class CaptureRecord:
+    __slots__ = ("kind", "timestamp", "payload")
+
+    def __init__(self, kind: int, timestamp: float, payload: memoryview):
+        self.kind = kind
+        self.timestamp = timestamp
+        self.payload = payload
+
+    @property
+    def name(self) -> str:
+        return RECORD_NAMES.get(self.kind, f"unknown-{self.kind}")
+
+    def json(self) -> dict:
+        return json.loads(bytes(self.payload))
+
+    def text(self) -> str:
+        return bytes(self.payload).decode("utf-8")
+
+
+class CaptureReader:
+    """Memory-mapped, sequential reader for capture files.
+
+    Record payloads are zero-copy views into the mapping; copy anything that must
+    outlive the reader, and drop the views before calling `close`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(CAPTURE_MAGIC):
+            self._file.close()
+            raise ValueError(f"{path} is not a capture file (too short).")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        if self._view[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a capture file (bad magic).")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        offset = len(CAPTURE_MAGIC)
+        end = len(self._view)
+        while offset + RECORD_HEADER.size <= end:
+            kind, timestamp, length = RECORD_HEADER.unpack_from(self._view, offset)
+            offset += RECORD_HEADER.size
+            if offset + length > end:
+                print(f"Capture: {self.path} ends with a truncated record, stopping.")
+                return
+            yield CaptureRecord(kind, timestamp, self._view[offset:offset + length])
+            offset += length
+
+    def meta(self) -> dict:
+        for record in self:
+            if record.kind == RECORD_META:
+                return record.json()
+        return {}
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            # A record payload is still referenced; the mapping is unmapped once it is dropped.
+            pass
+        self._file.close()
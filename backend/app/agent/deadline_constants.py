@@ -0,0 +1,26 @@
+# Overall deadline per logical call, covering queueing, hedges and retries.
+TTS_DEADLINE_S = 6.0  # s - one sentence of synthesize_speech
+TRANSCRIBE_DEADLINE_S = 12.0  # s - upload + generate_content for one utterance
+
+# Hedging: if an attempt has not returned after the observed latency percentile, a
+# duplicate is issued and whichever finishes first wins.
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_DELAY_S = 0.15  # s - never hedge earlier than this
+HEDGE_DEFAULT_DELAY_S = 1.5  # s - used until enough latencies have been observed
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW_SIZE = 200  # most recent successful call latencies kept per upstream
+MAX_HEDGES = 1  # duplicates per attempt
+
+# Retries after an attempt (and its hedges) failed with an error, within the deadline.
+MAX_RETRIES = 2
+RETRY_BACKOFF_BASE_S = 0.2  # s - doubled per retry, with full jitter
+RETRY_BACKOFF_MAX_S = 2.0  # s
+# Only errors that may succeed on another try are retried: timeouts, dropped connections
+# and these HTTP statuses (carried as `.code` by google.api_core and google.genai errors).
+# Auth and invalid-argument errors fail immediately.
+TRANSIENT_HTTP_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Threads for blocking SDK calls (synthesize_speech, upload_file, delete_file). Hedged
+# duplicates and abandoned attempts keep their thread, and their scheduler slot, until the
+# SDK returns, so this is sized above the scheduler's combined concurrency caps.
+UPSTREAM_EXECUTOR_WORKERS = 32
@@ -0,0 +1,300 @@
+import sys
+import time
+import asyncio
+import tracemalloc
+from collections import deque
+from typing import Awaitable, Callable
+
+from app.agent.outbound_constants import (
+    OUTPUT_SAMPLE_RATE, OUTPUT_BYTES_PER_SAMPLE, OUTPUT_CHANNELS,
+    OUTBOUND_FRAME_DURATION_MS, OUTBOUND_LEAD_MS, OUTBOUND_MAX_BUFFERED_MS, OUTBOUND_OVERFLOW_POLICY
+)
+
+OVERFLOW_POLICIES = ("block", "drop_oldest")
+
+# Schedulers of the currently connected sessions, keyed by session id, for metrics reporting.
+active_schedulers: dict[str, "OutboundAudioScheduler"] = {}
+
+
+def strip_wav_header(audio: bytes) -> bytes:
+    """Returns the PCM payload of a RIFF/WAVE blob, or the input unchanged if it is raw PCM.
+
+    Google TTS prepends a WAV header to LINEAR16 output; once the audio is split into
+    frames the header would otherwise be played as a click at the start of every sentence.
+    """
+    if len(audio) < 12 or audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return audio
+
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4]
+        chunk_size = int.from_bytes(audio[offset + 4:offset + 8], "little")
+        if chunk_id == b"data":
+            return audio[offset + 8:]
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return audio
+
+
+class OutboundAudioScheduler:
+    """Paces TTS audio to one client over its WebSocket.
+
+    Audio is split into short frames, each due at its real-time playback slot. A
+    background task sends each frame at most `lead_ms` before it is due, so the
+    client never holds more than the lead in its playback queue. Frames waiting on
+    the server are capped at `max_buffered_ms`; once full, `enqueue` waits for room.
+    With "drop_oldest", frames more than `lead_ms` past their playback time (the client
+    has fallen behind real time) are discarded instead, so only a lagging client loses audio; a buffer
+    that is full of future audio still makes the producer wait.
+    """
+
+    def __init__(
+            self,
+            session_id: str,
+            send_bytes: Callable[[bytes], Awaitable[None]],
+            sample_rate: int = OUTPUT_SAMPLE_RATE,
+            frame_ms: int = OUTBOUND_FRAME_DURATION_MS,
+            lead_ms: int = OUTBOUND_LEAD_MS,
+            max_buffered_ms: int = OUTBOUND_MAX_BUFFERED_MS,
+            overflow_policy: str = OUTBOUND_OVERFLOW_POLICY
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy '{overflow_policy}'. Expected one of: {', '.join(OVERFLOW_POLICIES)}"
+            )
+        if max_buffered_ms < frame_ms:
+            raise ValueError("max_buffered_ms must be at least one frame long.")
+
+        self.session_id = session_id
+        self.send_bytes = send_bytes
+        self.overflow_policy = overflow_policy
+        self.lead_s = lead_ms / 1000.0
+
+        bytes_per_sample_frame = OUTPUT_BYTES_PER_SAMPLE * OUTPUT_CHANNELS
+        self.bytes_per_second = sample_rate * bytes_per_sample_frame
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * bytes_per_sample_frame
+        self.max_buffered_bytes = int(sample_rate * max_buffered_ms / 1000) * bytes_per_sample_frame
+
+        self._frames: deque[tuple[float, bytes]] = deque()
+        self._buffered_bytes = 0
+        self._next_due = 0.0
+        self._cond = asyncio.Condition()
+        self._closed = False
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_dropped = 0
+        self.bytes_dropped = 0
+        self.producer_wait_s = 0.0
+        self.peak_buffered_bytes = 0
+        self.lag_s = 0.0
+        self.max_lag_s = 0.0
+        self.max_send_s = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        active_schedulers[self.session_id] = self
+        print(
+            f"Outbound for Client #{self.session_id}: Started. Frame={self.frame_bytes} bytes, "
+            f"Lead={self.lead_s * 1000:.0f}ms, Max buffered={self.max_buffered_bytes} bytes, "
+            f"Policy={self.overflow_policy}."
+        )
+
+    async def enqueue(self, audio: bytes) -> None:
+        """Queues an audio blob for paced delivery, applying the overflow policy per frame."""
+        audio = strip_wav_header(audio)
+
+        for offset in range(0, len(audio), self.frame_bytes):
+            frame = audio[offset:offset + self.frame_bytes]
+            async with self._cond:
+                self._raise_if_closed()
+                if self._buffered_bytes + len(frame) > self.max_buffered_bytes:
+                    await self._make_room(len(frame))
+
+                # After a pause in the answer, playback restarts from now rather than
+                # from where the previous sentence ended.
+                self._next_due = max(self._next_due, time.monotonic())
+                self._frames.append((self._next_due, frame))
+                self._next_due += len(frame) / self.bytes_per_second
+                self._buffered_bytes += len(frame)
+                self.peak_buffered_bytes = max(self.peak_buffered_bytes, self._buffered_bytes)
+                self._cond.notify_all()
+
+    async def close(self, drain: bool = True) -> None:
+        """Stops the sender, first delivering queued frames if `drain` is set."""
+        async with self._cond:
+            self._closed = True
+            if not drain:
+                self._frames.clear()
+                self._buffered_bytes = 0
+            self._cond.notify_all()
+
+        if self._task:
+            try:
+                await self._task
+            except Exception as e:
+                print(f"Outbound for Client #{self.session_id}: Sender stopped with error: {e}")
+
+        if active_schedulers.get(self.session_id) is self:
+            del active_schedulers[self.session_id]
+        print(f"Outbound for Client #{self.session_id}: Closed. Metrics: {self.metrics()}")
+
+    def metrics(self) -> dict:
+        return {
+            "buffered_ms": round(self._buffered_bytes / self.bytes_per_second * 1000, 1),
+            "peak_buffered_ms": round(self.peak_buffered_bytes / self.bytes_per_second * 1000, 1),
+            "lag_ms": round(self.lag_s * 1000, 1),
+            "max_lag_ms": round(self.max_lag_s * 1000, 1),
+            "max_send_ms": round(self.max_send_s * 1000, 1),
+            "producer_wait_ms": round(self.producer_wait_s * 1000, 1),
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_dropped": self.bytes_dropped,
+        }
+
+    async def _make_room(self, frame_len: int) -> None:
+        """Waits, with the condition held, until `frame_len` more bytes fit in the buffer."""
+        wait_start = time.monotonic()
+        while not self._closed and self._buffered_bytes + frame_len > self.max_buffered_bytes:
+            timeout = None
+            if self.overflow_policy == "drop_oldest":
+                self._drop_overdue(frame_len)
+                if self._buffered_bytes + frame_len <= self.max_buffered_bytes:
+                    break
+                # Re-check when the oldest frame becomes overdue, in case the client stalls.
+                timeout = max(0.0, self._frames[0][0] + self.lead_s - time.monotonic())
+            try:
+                await asyncio.wait_for(self._cond.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.producer_wait_s += time.monotonic() - wait_start
+        self._raise_if_closed()
+
+    def _drop_overdue(self, frame_len: int) -> None:
+        # Overdue means more than one lead past its playback time. The lead absorbs timer
+        # and send jitter, and a first frame queued before the sender has run, so a
+        # client that keeps up never loses frames.
+        now = time.monotonic()
+        while (
+                self._frames
+                and self._buffered_bytes + frame_len > self.max_buffered_bytes
+                and self._frames[0][0] + self.lead_s < now
+        ):
+            _, dropped = self._frames.popleft()
+            self._buffered_bytes -= len(dropped)
+            self.frames_dropped += 1
+            self.bytes_dropped += len(dropped)
+
+    def _raise_if_closed(self) -> None:
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise RuntimeError(f"Outbound audio for Client #{self.session_id} is closed.")
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self._frames or self._closed)
+                    if not self._frames:
+                        return
+                    due, frame = self._frames.popleft()
+                    self._buffered_bytes -= len(frame)
+                    self._cond.notify_all()
+
+                wait = due - self.lead_s - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                send_start = time.monotonic()
+                await self.send_bytes(frame)
+                sent_at = time.monotonic()
+
+                self.max_send_s = max(self.max_send_s, sent_at - send_start)
+                self.lag_s = max(0.0, sent_at - due)
+                self.max_lag_s = max(self.max_lag_s, self.lag_s)
+                self.frames_sent += 1
+                self.bytes_sent += len(frame)
+        except Exception as e:
+            async with self._cond:
+                self._error = e
+                self._closed = True
+                self._frames.clear()
+                self._buffered_bytes = 0
+                self._cond.notify_all()
+            raise
+
+
+async def _simulate_slow_reader(
+        overflow_policy: str,
+        link_speed: float,
+        audio_seconds: float = 3.0,
+        sentence_seconds: float = 0.5
+) -> tuple[int, int, dict]:
+    """
+    Feeds whole-sentence blobs as fast as possible into a client reading at `link_speed` x realtime.
+    Returns the peak traced memory, the bound it must stay under and the scheduler metrics.
+    """
+    bytes_per_second = OUTPUT_SAMPLE_RATE * OUTPUT_BYTES_PER_SAMPLE
+
+    async def slow_send(frame: bytes):
+        await asyncio.sleep(len(frame) / (bytes_per_second * link_speed))
+
+    scheduler = OutboundAudioScheduler(
+        f"sim-{overflow_policy}-{link_speed}x", slow_send,
+        lead_ms=100, max_buffered_ms=500, overflow_policy=overflow_policy
+    )
+    sentence = bytes(int(bytes_per_second * sentence_seconds))
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.monotonic()
+    scheduler.start()
+    for _ in range(int(audio_seconds / sentence_seconds)):
+        await scheduler.enqueue(sentence)
+    await scheduler.close()
+    elapsed = time.monotonic() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"policy={overflow_policy:<11} link={link_speed}x: {elapsed:.2f}s for {audio_seconds:.1f}s of audio, "
+        f"peak traced memory {peak / 1024:.0f} KiB, "
+        f"{scheduler.metrics()}"
+    )
+    # The queue may hold up to max_buffered_bytes of frames while the producer copies one
+    # more sentence in; anything beyond that plus bookkeeping means audio piles up unbounded.
+    memory_bound = scheduler.max_buffered_bytes + len(sentence) + _SIMULATION_MEMORY_SLACK_BYTES
+    return peak, memory_bound, scheduler.metrics()
+
+
+_SIMULATION_MEMORY_SLACK_BYTES = 16 * 1024
+
+
+async def _simulation() -> list[str]:
+    # Peak memory must not grow with the amount of audio produced for a slow reader,
+    # and a client that keeps up must not lose audio under either policy.
+    failures = []
+    runs = [("block", 10.0, 3.0), ("drop_oldest", 10.0, 3.0)]
+    for audio_seconds in (2.0, 4.0):
+        runs += [("block", 0.5, audio_seconds), ("drop_oldest", 0.5, audio_seconds)]
+
+    for overflow_policy, link_speed, audio_seconds in runs:
+        peak, memory_bound, metrics = await _simulate_slow_reader(
+            overflow_policy, link_speed=link_speed, audio_seconds=audio_seconds
+        )
+        label = f"policy={overflow_policy} link={link_speed}x audio={audio_seconds}s"
+        if peak > memory_bound:
+            failures.append(f"{label}: peak traced memory {peak} bytes over the {memory_bound} byte bound")
+        if (link_speed >= 1.0 or overflow_policy == "block") and metrics["frames_dropped"]:
+            failures.append(f"{label}: dropped {metrics['frames_dropped']} frames")
+    return failures
+
+
+if __name__ == "__main__":
+    simulation_failures = asyncio.run(_simulation())
+    for failure in simulation_failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if simulation_failures else 0)
@@ -0,0 +1,24 @@
+OUTPUT_SAMPLE_RATE = 24000  # Hz - LINEAR16 output of the TTS voice, played by the client at this rate
+OUTPUT_BYTES_PER_SAMPLE = 2  # 16-bit PCM audio
+OUTPUT_CHANNELS = 1  # Mono audio
+
+# Size of each outbound WebSocket message. Small frames let a slow client fall behind
+# gradually instead of stalling on a whole-sentence blob.
+OUTBOUND_FRAME_DURATION_MS = 40  # ms
+
+# How far ahead of real-time playback the server may send, to absorb network jitter.
+OUTBOUND_LEAD_MS = 300  # ms
+
+# Upper bound on audio queued on the server per session, waiting to be sent.
+OUTBOUND_MAX_BUFFERED_MS = 4000  # ms
+
+# What to do when the per-session buffer is full:
+#   "block"       - make the producer (TTS) wait until the client catches up
+#   "drop_oldest" - discard queued frames the client is already late for, so a lagging
+#                   client skips ahead; a client that keeps up is treated as with "block"
+OUTBOUND_OVERFLOW_POLICY = "block"
+
+# Derived constants based on the above configuration
+OUTPUT_BYTES_PER_SECOND = OUTPUT_SAMPLE_RATE * OUTPUT_BYTES_PER_SAMPLE * OUTPUT_CHANNELS
+OUTBOUND_BYTES_PER_FRAME = int(OUTPUT_BYTES_PER_SECOND * (OUTBOUND_FRAME_DURATION_MS / 1000.0))
+OUTBOUND_MAX_BUFFERED_BYTES = int(OUTPUT_BYTES_PER_SECOND * (OUTBOUND_MAX_BUFFERED_MS / 1000.0))
@@ -3,19 +3,23 @@ import re
 import time
 import base64
 import asyncio
-import numpy as np
-import sounddevice as sd
-from google.cloud import texttospeech
-from google.adk.sessions.in_memory_session_service import InMemorySessionService
-from google.adk.agents import LiveRequestQueue
-from google.adk.runners import Runner
-from google.adk.agents.run_config import RunConfig
-from google.genai.types import Part, Content
-from app.agent.base_agent import root_agent, PDFProcessor
+from app.agent.base_agent import get_root_agent, load_document_text
+from app.agent.shared_state import shared_store
+from app.agent.scheduler_constants import (
+    UPSTREAM_GEMINI_LIVE, UPSTREAM_TTS, PRIORITY_AGENT, PRIORITY_TTS, PRIORITY_FIRST_SENTENCE_TTS
+)
+from app.agent.upstream_scheduler import upstream_scheduler
+from app.agent.deadline_constants import TTS_DEADLINE_S
+from app.agent.outbound_constants import OUTPUT_SAMPLE_RATE
+from app.agent.tail_latency import CallPolicy, call_with_deadline, run_blocking, rpc_timeout
 
 APP_NAME = "Async TTS Streaming"
 SENTENCE_FLUSH_INTERVAL = 0.5 # seconds
-QUESTION = "what is the role of the decoder?? answer in one sentence"
+
+# Shared by all streamers so the hedge delay tracks process-wide TTS latency.
+TTS_CALL_POLICY = CallPolicy(
+    deadline_s=TTS_DEADLINE_S, hedge_guard=lambda: not upstream_scheduler.is_overloaded()
+)
 
 
 def sanitize_text(text: str) -> str:
@@ -28,6 +32,9 @@ def sanitize_text(text: str) -> str:
 
 class TTSStreamer:
     def __init__(self):
+        from google.cloud import texttospeech
+
+        self.texttospeech = texttospeech
         self.client = texttospeech.TextToSpeechClient()
         self.voice = texttospeech.VoiceSelectionParams(
             language_code="en-US",
@@ -35,22 +42,47 @@ class TTSStreamer:
         )
         self.config = texttospeech.AudioConfig(
             audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+            # Outbound pacing and the client's playback assume this rate; don't rely on the voice default.
+            sample_rate_hertz=OUTPUT_SAMPLE_RATE,
             speaking_rate=1.1
         )
+        # Audio depends only on text, voice and audio config; shared by every worker on the host.
+        self.cache = shared_store("tts")
+        self.cache_key_prefix = (
+            f"{self.voice.name}|{self.config.speaking_rate}|{self.config.audio_encoding}|"
+            f"{self.config.sample_rate_hertz}|"
+        )
 
-    async def synthesize(self, text: str) -> bytes:
+    async def synthesize(self, text: str, priority: int = PRIORITY_TTS) -> bytes:
         """Run synchronous synthesize under the hood—but wrap in a thread to avoid blocking."""
-        loop = asyncio.get_running_loop()
-        input_ = texttospeech.SynthesisInput(text=text)
-        return await loop.run_in_executor(
-            None,
-            lambda: self.client.synthesize_speech(
-                input=input_, voice=self.voice, audio_config=self.config
-            ).audio_content
-        )
+        cache_key = self.cache_key_prefix + text
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        input_ = self.texttospeech.SynthesisInput(text=text)
+
+        async def attempt():
+            async with upstream_scheduler.slot(UPSTREAM_TTS, priority):
+                timeout = rpc_timeout()
+                return await run_blocking(
+                    lambda: self.client.synthesize_speech(
+                        input=input_, voice=self.voice, audio_config=self.config, timeout=timeout
+                    ).audio_content
+                )
+
+        audio = await call_with_deadline("tts", attempt, TTS_CALL_POLICY)
+        self.cache.put(cache_key, audio)
+        return audio
 
 async def _agent_producer(question: str, doc_text: str, queue_out: asyncio.Queue):
     """Runs the ADK live agent and pushes cleansed text chunks into queue_out."""
+    from google.adk.sessions.in_memory_session_service import InMemorySessionService
+    from google.adk.agents import LiveRequestQueue
+    from google.adk.runners import Runner
+    from google.adk.agents.run_config import RunConfig
+    from google.genai.types import Part, Content
+
     session_svc = InMemorySessionService()
     session = session_svc.create_session(
         app_name=APP_NAME,
@@ -58,54 +90,72 @@ async def _agent_producer(question: str, doc_text: str, queue_out: asyncio.Queue
         session_id="session1",
         state={"document_text": doc_text}
     )
-    runner = Runner(app_name=APP_NAME, agent=root_agent, session_service=session_svc)
+    runner = Runner(app_name=APP_NAME, agent=get_root_agent(), session_service=session_svc)
     run_cfg = RunConfig(response_modalities=["TEXT"])
     live_q = LiveRequestQueue()
-    live_events = runner.run_live(session=session, live_request_queue=live_q, run_config=run_cfg)
 
-    # send the initial user question
-    live_q.send_content(Content(role="user", parts=[Part.from_text(text=question)]))
+    # the live connection counts against the quota for as long as the answer streams
+    async with upstream_scheduler.slot(UPSTREAM_GEMINI_LIVE, PRIORITY_AGENT):
+        live_events = runner.run_live(session=session, live_request_queue=live_q, run_config=run_cfg)
 
-    # stream partials
-    async for evt in live_events:
-        if evt.turn_complete:
-            break
+        # send the initial user question
+        live_q.send_content(Content(role="user", parts=[Part.from_text(text=question)]))
 
-        if not evt.partial or not evt.content or not evt.content.parts:
-            continue
-        raw = evt.content.parts[0].text or ""
-        cleaned = sanitize_text(raw)
-        if cleaned:
-            await queue_out.put(cleaned)
+        # stream partials
+        async for evt in live_events:
+            if evt.turn_complete:
+                break
+
+            if not evt.partial or not evt.content or not evt.content.parts:
+                continue
+            raw = evt.content.parts[0].text or ""
+            cleaned = sanitize_text(raw)
+            if cleaned:
+                await queue_out.put(cleaned)
 
     # sentinel
     await queue_out.put(None)
 
 
-async def answer_with_pdf(question: str, pdf_path: str):
+def with_history(question: str, history: list[dict] | None) -> str:
+    """Prefixes `question` with earlier turns of the conversation, if any."""
+    if not history:
+        return question
+    turns = "\n".join(f"User: {turn['question']}\nAssistant: {turn['answer']}" for turn in history)
+    return f"Earlier in this conversation:\n{turns}\n\nCurrent question: {question}"
+
+
+async def answer_with_pdf(
+        question: str,
+        pdf_path: str,
+        tts: TTSStreamer | None = None,
+        producer=_agent_producer,
+        history: list[dict] | None = None
+):
     """
     Async generator yielding dicts:
       {
         "text_chunk": "<string>",
         "audio_chunk": b"<raw pcm bytes>"
       }
+    `tts` and `producer` default to the real upstreams; replay passes stubs.
+    `history` holds earlier {"question", "answer"} turns from the session store.
     """
-    # 1) Extract text from PDF synchronously, since most PDF libs are blocking:
-    proc = PDFProcessor(pdf_path)
-    proc.process_pdf()
-    doc_text = proc.full_text
+    # 1) Extract text from PDF (parsed once per host, then read from the shared store):
+    doc_text = load_document_text(pdf_path)
 
     # 2) Set up shared queue
     text_queue: asyncio.Queue[str | None] = asyncio.Queue()
 
     # 3) Start agent producer
-    producer_task = asyncio.create_task(_agent_producer(question, doc_text, text_queue))
+    producer_task = asyncio.create_task(producer(with_history(question, history), doc_text, text_queue))
 
     # 4) TTS streamer instance
-    tts = TTSStreamer()
+    tts = tts or TTSStreamer()
 
     buffer: list[str] = []
     last_flush = time.monotonic()
+    first_sentence = True
 
     # 5) Consume text_queue, batch, synthesize, and yield
     while True:
@@ -122,7 +172,9 @@ async def answer_with_pdf(question: str, pdf_path: str):
 
         if buffer and (chunk is None or any(c in (chunk or "") for c in ".!?") or (now - last_flush) >= SENTENCE_FLUSH_INTERVAL):
             to_say = "".join(buffer)
-            audio_bytes = await tts.synthesize(to_say)
+            priority = PRIORITY_FIRST_SENTENCE_TTS if first_sentence else PRIORITY_TTS
+            audio_bytes = await tts.synthesize(to_say, priority)
+            first_sentence = False
             yield {
                 "text_chunk": to_say,
                 "audio_chunk": audio_bytes
@@ -139,28 +191,3 @@ async def answer_with_pdf(question: str, pdf_path: str):
 
     # ensure producer_task has finished
     await producer_task
-
-
-async def _playback_test():
-    pdf_path = "./app/data/attention_is_all_you_need.pdf"
-    async for part in answer_with_pdf(QUESTION, pdf_path):
-        text = part["text_chunk"]
-        audio_bytes = part["audio_chunk"]
-
-        # print the text chunk
-        print(text, end=" | ", flush=True)
-
-        # convert bytes to int16 numpy array
-        audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
-
-        # normalize to float32 in [-1.0, 1.0]
-        audio_float = audio_array.astype(np.float32) / 32768.0
-
-        # play (non-blocking) and wait until done
-        sd.wait()
-        sd.play(audio_float, samplerate=24000)
-
-    print("\n[ALL DONE]")
-
-if __name__ == "__main__":
-    asyncio.run(_playback_test())
\ No newline at end of file
@@ -0,0 +1,16 @@
+from app.agent.vad_constants import SAMPLE_RATE
+
+# Recognition modes a client can pick per session with the `recognition` query parameter:
+#   "batch"     - upload each complete utterance after end of speech (TranscribeAgent)
+#   "streaming" - forward speech frames to a live session while the user talks
+RECOGNITION_MODES = ("batch", "streaming")
+DEFAULT_RECOGNITION_MODE = "batch"
+
+STREAMING_MODEL = "gemini-2.0-flash-live-001"
+STREAMING_AUDIO_MIME_TYPE = f"audio/pcm;rate={SAMPLE_RATE}"
+
+# How long to wait for the final transcript after our VAD has endpointed.
+STREAMING_FINAL_TIMEOUT_S = 2.0  # s
+
+# Frames are batched into messages of this length before being forwarded.
+STREAMING_SEND_INTERVAL_MS = 90  # ms
@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+# Resampling filter design. The filter spans RESAMPLER_ZERO_CROSSINGS sinc lobes on
+# each side of its centre; cutoff is pulled slightly below Nyquist to leave room for
+# the transition band.
+RESAMPLER_ZERO_CROSSINGS = 12
+RESAMPLER_ROLLOFF = 0.92
+RESAMPLER_KAISER_BETA = 8.0
+# Work buffers are sized for, and input is resampled in blocks of, this much audio, so
+# memory per connection does not depend on how large a client makes its messages.
+RESAMPLER_BLOCK_MS = 100
+
+
+class PolyphaseResampler:
+    """Stateful rational-ratio resampler for a mono float32 stream.
+
+    Filter history and the output phase are carried across calls, so feeding a
+    stream chunk by chunk produces the same samples as resampling it in one go.
+    Work buffers are sized for `block_size` inputs, grown on demand and reused, so
+    steady-state chunks of a similar size do not allocate new arrays.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int):
+        g = math.gcd(input_rate, output_rate)
+        self.up = output_rate // g
+        self.down = input_rate // g
+
+        # Prototype low-pass filter at the upsampled rate.
+        factor = max(self.up, self.down)
+        cutoff = RESAMPLER_ROLLOFF * 0.5 / factor
+        half_len = RESAMPLER_ZERO_CROSSINGS * factor
+        n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+        h = 2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.kaiser(len(n), RESAMPLER_KAISER_BETA)
+        h *= self.up / h.sum()  # unity passband gain after zero-stuffing
+
+        # Split into phases: phases[p, k] = h[p + k * up], reversed along k so each
+        # row can be applied directly to a forward-ordered input window.
+        self.taps = -(-len(h) // self.up)
+        h = np.concatenate([h, np.zeros(self.taps * self.up - len(h))])
+        self.phases = np.ascontiguousarray(
+            h.reshape(self.taps, self.up).T[:, ::-1], dtype=np.float32
+        )
+
+        self._history_len = self.taps - 1
+        self._phase_pos = 0  # next output position, in upsampled units, relative to the next input
+        self._capacity = 0
+        self._out_capacity = 0
+        self.block_size = max(1, input_rate * RESAMPLER_BLOCK_MS // 1000)
+        self._ensure_capacity(self.block_size)
+
+    def _ensure_capacity(self, num_inputs: int) -> None:
+        if num_inputs > self._capacity:
+            old = self._input_buffer[:self._history_len] if self._capacity else None
+            self._capacity = max(num_inputs, 2 * self._capacity)
+            self._input_buffer = np.zeros(self._history_len + self._capacity, dtype=np.float32)
+            if old is not None:
+                self._input_buffer[:self._history_len] = old
+
+        max_outputs = (self._capacity * self.up) // self.down + 1
+        if max_outputs > self._out_capacity:
+            self._out_capacity = max_outputs
+            self._steps = np.arange(max_outputs, dtype=np.int64) * self.down
+            self._positions = np.empty(max_outputs, dtype=np.int64)
+            self._indices = np.empty(max_outputs, dtype=np.int64)
+            self._phase_indices = np.empty(max_outputs, dtype=np.int64)
+            self._windows = np.empty((max_outputs, self.taps), dtype=np.float32)
+            self._coeffs = np.empty((max_outputs, self.taps), dtype=np.float32)
+            self._output = np.empty(max_outputs, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """Resample a chunk of mono float32 samples.
+
+        Returns a view into an internal buffer that is only valid until the next call.
+        """
+        num_inputs = len(samples)
+        if num_inputs == 0:
+            return self._output[:0]
+
+        self._ensure_capacity(num_inputs)
+        hist = self._history_len
+        buf = self._input_buffer
+        buf[hist:hist + num_inputs] = samples
+
+        total_upsampled = num_inputs * self.up
+        if self._phase_pos < total_upsampled:
+            count = -(-(total_upsampled - self._phase_pos) // self.down)
+        else:
+            count = 0
+
+        out = self._output[:count]
+        if count:
+            positions = self._positions[:count]
+            indices = self._indices[:count]
+            phase_indices = self._phase_indices[:count]
+            np.add(self._steps[:count], self._phase_pos, out=positions)
+            np.floor_divide(positions, self.up, out=indices)
+            np.remainder(positions, self.up, out=phase_indices)
+
+            # Window i covers buf[i : i + taps], i.e. the input sample i and its history.
+            all_windows = np.lib.stride_tricks.sliding_window_view(buf[:hist + num_inputs], self.taps)
+            windows = self._windows[:count]
+            coeffs = self._coeffs[:count]
+            np.take(all_windows, indices, axis=0, out=windows)
+            np.take(self.phases, phase_indices, axis=0, out=coeffs)
+            np.multiply(windows, coeffs, out=windows)
+            np.sum(windows, axis=1, out=out)
+
+        self._phase_pos += count * self.down - total_upsampled
+        if hist:
+            buf[:hist] = buf[num_inputs:num_inputs + hist]
+        return out
@@ -0,0 +1,32 @@
+# Multi-worker deployment: `python -m app.multiworker` runs WORKER_COUNT uvicorn workers on
+# consecutive ports from WORKER_BASE_PORT behind an affinity router on the public port.
+WORKER_BASE_PORT = 8100
+WORKER_COUNT_ENV = "WORKER_COUNT"  # set by the launcher; per-process upstream limits are divided by it
+WORKER_ID_ENV = "WORKER_ID"
+WORKER_RESTART_DELAY_S = 1.0
+
+# Affinity router.
+ROUTER_MAX_HEADER_BYTES = 64 * 1024
+ROUTER_CONNECT_TIMEOUT_S = 2.0
+ROUTER_PIPE_CHUNK_BYTES = 64 * 1024
+ROUTER_WORKER_RETRY_S = 5.0  # a worker that refused a connection is skipped for this long
+
+# Host-local state shared by all workers. /dev/shm is memory-backed, so reads are memory
+# copies; elsewhere the system temp directory is used.
+SHARED_STATE_DIR_ENV = "SHARED_STATE_DIR"
+SHARED_STATE_DIR_NAME = "gdg-backend"
+SHARED_STORE_MAX_BYTES = {
+    "tts": 64 * 1024 * 1024,  # synthesized audio keyed by text and voice
+    "documents": 64 * 1024 * 1024,  # extracted document text
+    "sessions": 16 * 1024 * 1024,
+}
+# Each worker counts what it writes and rescans the directory only when its count goes over
+# budget or this long after the last scan, to pick up what the other workers wrote.
+SHARED_STORE_RESCAN_INTERVAL_S = 60.0
+
+# Session store: "memory" keeps state in the worker, "file" shares it across the host's
+# workers. The multi-worker launcher defaults to "file".
+SESSION_STORE_ENV = "SESSION_STORE"
+DEFAULT_SESSION_STORE = "memory"
+SESSION_TTL_S = 60 * 60
+SESSION_MAX_TURNS = 6  # most recent question/answer pairs kept and replayed to the agent
@@ -0,0 +1,28 @@
+# Upstream names used when submitting work to the process-wide scheduler.
+UPSTREAM_GEMINI = "gemini"  # generate_content_async, upload_file, delete_file
+UPSTREAM_GEMINI_LIVE = "gemini_live"  # run_live sessions, held for the whole answer
+UPSTREAM_TTS = "tts"  # synthesize_speech
+
+# Per-upstream limits: requests per second, burst size and concurrent calls in flight.
+# Set below the project quota so bursts queue here instead of failing upstream.
+UPSTREAM_LIMITS = {
+    UPSTREAM_GEMINI: {"rate_per_s": 10.0, "burst": 10, "max_concurrency": 8},
+    UPSTREAM_GEMINI_LIVE: {"rate_per_s": 2.0, "burst": 4, "max_concurrency": 8},
+    UPSTREAM_TTS: {"rate_per_s": 15.0, "burst": 15, "max_concurrency": 12},
+}
+
+# Lower value = served first. Anything the user is actively waiting on to hear the
+# start of an answer ranks above the rest of the answer.
+PRIORITY_TRANSCRIPTION = 0
+PRIORITY_FIRST_SENTENCE_TTS = 0
+PRIORITY_AGENT = 1
+PRIORITY_TTS = 2
+PRIORITY_BACKGROUND = 3  # cleanup calls nobody is waiting on
+
+# Session admission. New sessions are admitted while fewer than MAX_ACTIVE_SESSIONS are
+# running and no upstream has more than OVERLOAD_QUEUE_DEPTH calls waiting; otherwise up
+# to MAX_WAITING_SESSIONS queue for at most SESSION_ADMISSION_TIMEOUT_S and the rest are shed.
+MAX_ACTIVE_SESSIONS = 32
+MAX_WAITING_SESSIONS = 16
+OVERLOAD_QUEUE_DEPTH = 24
+SESSION_ADMISSION_TIMEOUT_S = 10.0
@@ -0,0 +1,144 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+import itertools
+from urllib.parse import unquote, urlsplit
+
+from app.agent.scaling_constants import (
+    ROUTER_MAX_HEADER_BYTES, ROUTER_CONNECT_TIMEOUT_S, ROUTER_PIPE_CHUNK_BYTES, ROUTER_WORKER_RETRY_S
+)
+
+ROUTER_METRICS_PATH = "/router/metrics"  # answered by the router itself
+
+# WebSocket routes in app/routes/stream.py that carry a session id as their last segment.
+SESSION_ROUTE = re.compile(r"^/stream/(?:discuss|test/transcribe|test/echo|test/vad)/([^/]+)$")
+
+Worker = tuple[str, int]
+
+
+def session_id_from_path(path: str) -> str | None:
+    match = SESSION_ROUTE.match(path)
+    return unquote(match.group(1)) if match else None
+
+
+def rank_workers(session_id: str, workers: list[Worker]) -> list[Worker]:
+    """Workers in order of preference for `session_id` (rendezvous hashing).
+
+    Every router computes the same order without shared state, and when a worker is
+    down only its own sessions move, each to its next-ranked worker.
+    """
+    def score(worker: Worker) -> int:
+        digest = hashlib.blake2b(f"{worker[0]}:{worker[1]}|{session_id}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    return sorted(workers, key=score, reverse=True)
+
+
+class AffinityRouter:
+    """TCP-level reverse proxy that pins each session to one worker.
+
+    Only the first request head on a connection is parsed. Session routes go to the
+    session's top-ranked live worker, anything else round-robin; after that, bytes are
+    copied both ways untouched, so WebSocket upgrades and keep-alive connections stay on
+    the worker that took the first request.
+    """
+
+    def __init__(self, workers: list[Worker]):
+        self.workers = workers
+        self._round_robin = itertools.cycle(range(len(workers)))
+        self._down_until: dict[Worker, float] = {}
+        self.connections = {worker: 0 for worker in workers}
+        self.failovers = 0
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._handle, host, port, limit=ROUTER_MAX_HEADER_BYTES)
+        print(f"Router: Listening on {host}:{port}, {len(self.workers)} workers.")
+        async with server:
+            await server.serve_forever()
+
+    def _candidates(self, session_id: str | None) -> list[Worker]:
+        if session_id is not None:
+            ranked = rank_workers(session_id, self.workers)
+        else:
+            start = next(self._round_robin)
+            ranked = self.workers[start:] + self.workers[:start]
+        now = time.monotonic()
+        live = [worker for worker in ranked if self._down_until.get(worker, 0) <= now]
+        # If everything looks down, try anyway rather than refusing outright.
+        return live or ranked
+
+    async def _connect(self, session_id: str | None):
+        for i, worker in enumerate(self._candidates(session_id)):
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(*worker), ROUTER_CONNECT_TIMEOUT_S)
+            except (OSError, asyncio.TimeoutError) as e:
+                print(f"Router: Worker {worker[0]}:{worker[1]} unavailable: {e}")
+                self._down_until[worker] = time.monotonic() + ROUTER_WORKER_RETRY_S
+                continue
+            if i > 0 and session_id is not None:
+                self.failovers += 1
+                print(f"Router: Session {session_id} failed over to {worker[0]}:{worker[1]}.")
+            self._down_until.pop(worker, None)
+            self.connections[worker] += 1
+            return reader, writer
+        return None, None
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+
+        request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+        parts = request_line.split(" ")
+        path = urlsplit(parts[1]).path if len(parts) == 3 else ""
+        if path == ROUTER_METRICS_PATH:
+            body = json.dumps(self.metrics()).encode("utf-8")
+            client_writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await client_writer.drain()
+            client_writer.close()
+            return
+        session_id = session_id_from_path(path)
+
+        upstream_reader, upstream_writer = await self._connect(session_id)
+        if upstream_writer is None:
+            client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await client_writer.drain()
+            client_writer.close()
+            return
+
+        peer = client_writer.get_extra_info("peername")
+        if peer:
+            head = head[:-2] + f"X-Forwarded-For: {peer[0]}\r\n\r\n".encode("latin-1")
+        upstream_writer.write(head)
+        try:
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer)
+            )
+        finally:
+            upstream_writer.close()
+            client_writer.close()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while data := await reader.read(ROUTER_PIPE_CHUNK_BYTES):
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            writer.close()
+
+    def metrics(self) -> dict:
+        return {
+            "connections": {f"{host}:{port}": count for (host, port), count in self.connections.items()},
+            "failovers": self.failovers,
+        }
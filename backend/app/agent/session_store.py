@@ -0,0 +1,107 @@
+import os
+import json
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable
+
+from app.agent.scaling_constants import SESSION_STORE_ENV, DEFAULT_SESSION_STORE, SESSION_TTL_S
+from app.agent.shared_state import shared_store
+
+
+class SessionStore(ABC):
+    """Conversation state keyed by session_id that outlives a single connection.
+
+    State is a JSON-serializable dict. Implementations expire sessions `ttl_s` after
+    their last save.
+    """
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S):
+        self.ttl_s = ttl_s
+
+    @abstractmethod
+    async def load(self, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, state: dict) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store. Only correct when a single worker serves every connection."""
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S):
+        super().__init__(ttl_s)
+        self._sessions: dict[str, tuple[float, dict]] = {}
+
+    async def load(self, session_id: str) -> dict | None:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if time.time() >= expires_at:
+            del self._sessions[session_id]
+            return None
+        return json.loads(json.dumps(state))  # callers may mutate what they load
+
+    async def save(self, session_id: str, state: dict) -> None:
+        self._sessions[session_id] = (time.time() + self.ttl_s, json.loads(json.dumps(state)))
+
+    async def delete(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+
+class LocalFileSessionStore(SessionStore):
+    """Host-local stand-in for a shared store, backed by the workers' shared state directory.
+
+    Any worker on the host can resume a session saved by another, which covers a
+    reconnect that lands elsewhere after a worker restart. A multi-host deployment
+    registers a networked store under its own name instead.
+    """
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S):
+        super().__init__(ttl_s)
+        self.store = shared_store("sessions")
+
+    async def load(self, session_id: str) -> dict | None:
+        raw = self.store.get(session_id)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if time.time() >= entry["expires_at"]:
+            self.store.delete(session_id)
+            return None
+        return entry["state"]
+
+    async def save(self, session_id: str, state: dict) -> None:
+        entry = {"expires_at": time.time() + self.ttl_s, "state": state}
+        self.store.put(session_id, json.dumps(entry).encode("utf-8"))
+
+    async def delete(self, session_id: str) -> None:
+        self.store.delete(session_id)
+
+
+SESSION_STORES: dict[str, Callable[[], SessionStore]] = {
+    "memory": InMemorySessionStore,
+    "file": LocalFileSessionStore,
+}
+
+
+def register_session_store(name: str, factory: Callable[[], SessionStore]) -> None:
+    """Makes `factory` selectable with SESSION_STORE=<name>."""
+    SESSION_STORES[name] = factory
+    get_session_store.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_session_store() -> SessionStore:
+    name = os.getenv(SESSION_STORE_ENV, DEFAULT_SESSION_STORE)
+    if name not in SESSION_STORES:
+        raise ValueError(f"Unknown {SESSION_STORE_ENV} '{name}'. Available: {', '.join(SESSION_STORES)}.")
+    print(f"Session store: Using '{name}'.")
+    return SESSION_STORES[name]()
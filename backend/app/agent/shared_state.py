@@ -0,0 +1,204 @@
+import os
+import time
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable
+
+from app.agent.scaling_constants import (
+    SHARED_STATE_DIR_ENV,
+    SHARED_STATE_DIR_NAME,
+    SHARED_STORE_MAX_BYTES,
+    SHARED_STORE_RESCAN_INTERVAL_S,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process locking, workers may duplicate work
+    fcntl = None
+
+
+def shared_state_dir() -> str:
+    configured = os.getenv(SHARED_STATE_DIR_ENV)
+    if configured:
+        return configured
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, SHARED_STATE_DIR_NAME)
+
+
+def _private_dir(path: str) -> None:
+    """Creates `path` readable only by this user, or checks that an existing one is.
+
+    The default root lives in world-writable /dev/shm, where another local user could
+    create the directory first and feed the workers cached answers or session state.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.path.islink(path) or not os.path.isdir(path):
+        raise PermissionError(f"Shared state path {path} is not a directory.")
+    info = os.lstat(path)
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Shared state directory {path} is owned by uid {info.st_uid}, not {os.getuid()}.")
+        if info.st_mode & 0o022:
+            raise PermissionError(f"Shared state directory {path} is writable by other users.")
+
+
+class SharedFileStore:
+    """Bytes-by-key store in a host-local directory, shared by every worker process on the host.
+
+    Values are written to a temporary file and renamed into place, so a reader in another
+    process sees either the whole value or nothing. `get_or_create` takes a per-key file
+    lock so an expensive value is computed by one worker while the others wait for it.
+    Once over `max_bytes`, the least recently written values are removed. The size is
+    counted as values are written, so a put only scans the directory when it goes over
+    budget or once every SHARED_STORE_RESCAN_INTERVAL_S.
+    """
+
+    def __init__(self, namespace: str, root: str | None = None, max_bytes: int | None = None):
+        self.namespace = namespace
+        self.path = os.path.join(root or shared_state_dir(), namespace)
+        self.max_bytes = max_bytes
+        _private_dir(os.path.dirname(self.path))
+        _private_dir(self.path)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes = 0
+        self._last_scan = float("-inf")
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with open(self._file(key), "rb") as f:
+                value = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        path = self._file(key)
+        replaced = self._size(path)
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._total_bytes += len(value) - replaced
+        if self.max_bytes is not None:
+            now = time.monotonic()
+            if self._total_bytes > self.max_bytes or now - self._last_scan >= SHARED_STORE_RESCAN_INTERVAL_S:
+                self._last_scan = now
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        path = self._file(key)
+        size = self._size(path)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            return
+        self._total_bytes = max(0, self._total_bytes - size)
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def get_or_create(self, key: str, create: Callable[[], bytes]) -> bytes:
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock(key):
+            # Another worker may have created it while we waited for the lock.
+            value = self.get(key)
+            if value is None:
+                value = create()
+                self.put(key, value)
+        return value
+
+    @contextmanager
+    def _lock(self, key: str):
+        if fcntl is None:
+            yield
+            return
+        with open(self._file(key) + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.startswith(".tmp-") or entry.name.endswith(".lock"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.unlink(path)
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._total_bytes = total
+
+    def metrics(self) -> dict:
+        return {"path": self.path, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+@lru_cache(maxsize=None)
+def shared_store(namespace: str) -> SharedFileStore:
+    """Process-wide store for `namespace`, created on first use so .env can set SHARED_STATE_DIR."""
+    return SharedFileStore(namespace, max_bytes=SHARED_STORE_MAX_BYTES.get(namespace))
+
+
+def file_version(path: str) -> str:
+    """Cache key component that changes whenever the file at `path` is replaced or edited."""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _benchmark_document_text(pdf_path: str = "./app/data/attention_is_all_you_need.pdf", runs: int = 5):
+    """Compares parsing the PDF on every answer with reading the shared extracted text."""
+    from app.agent.base_agent import PDFProcessor, load_document_text, _load_document_text
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        proc = PDFProcessor(pdf_path)
+        proc.process_pdf()
+    parse_ms = (time.perf_counter() - start) / runs * 1000
+
+    load_document_text(pdf_path)
+    start = time.perf_counter()
+    for _ in range(runs):
+        _load_document_text.cache_clear()  # simulate a fresh worker: skip the in-process cache
+        load_document_text(pdf_path)
+    shared_ms = (time.perf_counter() - start) / runs * 1000
+    print(f"Document text: parse {parse_ms:.1f}ms, shared store {shared_ms:.2f}ms per load.")
+
+
+if __name__ == "__main__":
+    _benchmark_document_text()
@@ -0,0 +1,294 @@
+import time
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.agent.base_agent import get_transcription_agent
+from app.agent.recognition_constants import (
+    STREAMING_AUDIO_MIME_TYPE, STREAMING_FINAL_TIMEOUT_S, STREAMING_SEND_INTERVAL_MS
+)
+from app.agent.scheduler_constants import UPSTREAM_GEMINI_LIVE, PRIORITY_TRANSCRIPTION
+from app.agent.upstream_scheduler import upstream_scheduler
+from app.agent.vad import SpeechListener, VoiceActivityDetector
+from app.agent.vad_constants import SAMPLE_RATE, BYTES_PER_SAMPLE, MIN_SPEECH_FRAMES_THRESHOLD
+
+APP_NAME = "Streaming Recognition"
+
+
+class AdkLiveConnection:
+    """One live session used to transcribe a single utterance.
+
+    Activity detection is done by our VAD, so the live session's own detection is
+    disabled and the utterance is delimited with explicit activity start/end signals.
+    `events()` yields (text, final) pairs: incremental transcript text while the user
+    talks, then one final pair once the model has closed the turn.
+    """
+
+    def __init__(self, session_id: str):
+        from google.adk.agents import LiveRequestQueue
+        from google.genai.types import Blob
+
+        self.session_id = session_id
+        self.live_q = LiveRequestQueue()
+        self._blob = Blob
+        self._events = None
+
+    async def open(self) -> None:
+        from google.adk.agents.run_config import RunConfig
+        from google.adk.runners import Runner
+        from google.adk.sessions.in_memory_session_service import InMemorySessionService
+        from google.genai.types import AudioTranscriptionConfig, AutomaticActivityDetection, RealtimeInputConfig
+
+        session_svc = InMemorySessionService()
+        session = session_svc.create_session(app_name=APP_NAME, user_id=self.session_id, session_id=self.session_id)
+        runner = Runner(app_name=APP_NAME, agent=get_transcription_agent(), session_service=session_svc)
+        run_cfg = RunConfig(
+            response_modalities=["TEXT"],
+            input_audio_transcription=AudioTranscriptionConfig(),
+            realtime_input_config=RealtimeInputConfig(
+                automatic_activity_detection=AutomaticActivityDetection(disabled=True)
+            )
+        )
+        self._events = runner.run_live(session=session, live_request_queue=self.live_q, run_config=run_cfg)
+        self.live_q.send_activity_start()
+
+    def send_audio(self, pcm: bytes) -> None:
+        self.live_q.send_realtime(self._blob(data=pcm, mime_type=STREAMING_AUDIO_MIME_TYPE))
+
+    def end_activity(self) -> None:
+        self.live_q.send_activity_end()
+
+    async def events(self) -> AsyncIterator[tuple[str, bool]]:
+        model_text = []
+        transcribed = False
+        async for evt in self._events:
+            transcription = getattr(evt, "input_transcription", None)
+            if transcription and transcription.text:
+                transcribed = True
+                yield transcription.text, False
+            elif evt.content and evt.content.parts and not evt.partial:
+                model_text.append(evt.content.parts[0].text or "")
+
+            if evt.turn_complete or (transcription and getattr(transcription, "finished", False)):
+                # Fall back to the model's verbatim reply if no input transcription came back.
+                yield ("" if transcribed else "".join(model_text)), True
+                return
+
+    async def close(self) -> None:
+        self.live_q.close()
+        if self._events is not None:
+            # Closing the queue alone leaves run_live's connection open until it is garbage collected.
+            await self._events.aclose()
+
+
+class StreamingRecognizer(SpeechListener):
+    """Transcribes speech while it is being spoken, over a live session.
+
+    Attached to a VoiceActivityDetector as its listener: a live connection is opened
+    once the utterance is long enough that the VAD will not discard it as a blip,
+    frames are forwarded as they are detected, and
+    `finish_utterance` returns the final transcript once the VAD endpoints. Partial
+    transcripts are passed to `on_partial` as they arrive.
+    """
+
+    def __init__(
+            self,
+            session_id: str,
+            connect: Callable[[str], "AdkLiveConnection"] = AdkLiveConnection,
+            on_partial: Callable[[str], Awaitable[None]] | None = None,
+            final_timeout_s: float = STREAMING_FINAL_TIMEOUT_S
+    ):
+        self.session_id = session_id
+        self.connect = connect
+        self.on_partial = on_partial
+        self.final_timeout_s = final_timeout_s
+        self.send_batch_bytes = int(SAMPLE_RATE * STREAMING_SEND_INTERVAL_MS / 1000) * BYTES_PER_SAMPLE
+
+        self._connection = None
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+        self._final: asyncio.Future | None = None
+        self._pending = bytearray()
+        self._listening = False
+        self._frames = 0
+        self._speech_frames = 0
+        self._text: list[str] = []
+        self.last_final_latency_s: float | None = None
+
+    async def on_speech_start(self) -> None:
+        await self.on_speech_discard()
+        self._listening = True
+        self._frames = 0
+        self._speech_frames = 0
+
+    async def on_speech_frame(self, frame: bytes, is_speech: bool = True) -> None:
+        if not self._listening:
+            return
+        self._pending.extend(frame)
+        self._frames += 1
+        if is_speech:
+            # Frames up to the latest speech frame, counted as the VAD does for its minimum.
+            self._speech_frames = self._frames
+        if self._task is None:
+            # A live session costs a gemini_live token, shared with the answering agent, so
+            # blips the VAD will discard must not open one. Buffered frames go out once it is ready.
+            if self._speech_frames >= MIN_SPEECH_FRAMES_THRESHOLD:
+                self._start_utterance()
+        elif self._ready.is_set() and len(self._pending) >= self.send_batch_bytes:
+            self._flush()
+
+    async def on_speech_discard(self) -> None:
+        self._listening = False
+        self._pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
+
+    async def finish_utterance(self) -> str:
+        """Signals end of speech and returns the final transcript (or the best partial on timeout)."""
+        if self._task is None and self._listening and self._pending:
+            self._start_utterance()
+        if self._task is None:
+            return ""
+        endpoint_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self._ready.wait(), self.final_timeout_s)
+            if not self._final.done():
+                self._flush()
+                self._connection.end_activity()
+            transcript = await asyncio.wait_for(asyncio.shield(self._final), self.final_timeout_s)
+        except asyncio.TimeoutError:
+            transcript = "".join(self._text)
+            print(f"Streaming ASR for Client #{self.session_id}: No final transcript in time, using partial.")
+        except Exception as e:
+            transcript = "".join(self._text)
+            print(f"Streaming ASR for Client #{self.session_id}: Live session failed: {e}")
+        finally:
+            await self.on_speech_discard()
+
+        self.last_final_latency_s = time.monotonic() - endpoint_at
+        print(
+            f"Streaming ASR for Client #{self.session_id}: Final transcript "
+            f"{self.last_final_latency_s * 1000:.0f}ms after endpoint: '{transcript}'"
+        )
+        return transcript.strip()
+
+    def _start_utterance(self) -> None:
+        self._text = []
+        self._ready = asyncio.Event()
+        self._final = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run_utterance())
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._connection.send_audio(bytes(self._pending))
+            self._pending.clear()
+
+    async def _run_utterance(self) -> None:
+        final, ready = self._final, self._ready
+        try:
+            async with upstream_scheduler.slot(UPSTREAM_GEMINI_LIVE, PRIORITY_TRANSCRIPTION):
+                self._connection = connection = self.connect(self.session_id)
+                try:
+                    await connection.open()
+                    ready.set()
+                    # Speech captured while connecting goes out in one message.
+                    self._flush()
+
+                    async for text, is_final in connection.events():
+                        if is_final:
+                            final.set_result("".join(self._text) + text)
+                            return
+                        self._text.append(text)
+                        if self.on_partial:
+                            await self.on_partial("".join(self._text))
+                finally:
+                    await connection.close()
+        except Exception as e:
+            if not final.done():
+                final.set_exception(e)
+            ready.set()
+
+
+class FakeLiveConnection:
+    """Local stand-in for a live session, for exercising streaming recognition offline.
+
+    Emits one word of partial transcript per `word_ms` of audio received and the final
+    transcript `final_latency_s` after activity end.
+    """
+
+    def __init__(self, session_id: str, connect_latency_s: float = 0.25, word_ms: int = 300,
+                 final_latency_s: float = 0.15):
+        self.session_id = session_id
+        self.connect_latency_s = connect_latency_s
+        self.word_bytes = int(SAMPLE_RATE * word_ms / 1000) * BYTES_PER_SAMPLE
+        self.final_latency_s = final_latency_s
+        self._received = 0
+        self._words = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def open(self) -> None:
+        await asyncio.sleep(self.connect_latency_s)
+
+    def send_audio(self, pcm: bytes) -> None:
+        self._received += len(pcm)
+        while self._received >= (self._words + 1) * self.word_bytes:
+            self._words += 1
+            self._queue.put_nowait((f"word{self._words} ", False))
+
+    def end_activity(self) -> None:
+        asyncio.get_running_loop().call_later(self.final_latency_s, self._queue.put_nowait, ("", True))
+
+    async def events(self) -> AsyncIterator[tuple[str, bool]]:
+        while True:
+            item = await self._queue.get()
+            yield item
+            if item[1]:
+                return
+
+    async def close(self) -> None:
+        pass
+
+
+async def _simulate(num_utterances: int = 3, chunk_ms: int = 20):
+    """Feeds synthetic speech in real time through the VAD and a recognizer on the fake live endpoint."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SAMPLE_RATE * 1.5)) / SAMPLE_RATE
+    speech = 0.3 * np.sin(2 * np.pi * 200 * t) * np.sin(2 * np.pi * 3 * t) + 0.05 * rng.standard_normal(len(t))
+    silence = np.zeros(SAMPLE_RATE)
+    audio = np.concatenate([silence] + [np.concatenate([speech, silence]) for _ in range(num_utterances)])
+    pcm = (audio * 32767).astype(np.int16).tobytes()
+
+    partials = []
+
+    async def on_partial(text: str):
+        partials.append(text)
+
+    recognizer = StreamingRecognizer("sim", connect=FakeLiveConnection, on_partial=on_partial)
+    vad = VoiceActivityDetector("sim", listener=recognizer)
+    chunk_bytes = int(SAMPLE_RATE * chunk_ms / 1000) * BYTES_PER_SAMPLE
+    latencies = []
+    start = time.monotonic()
+
+    for i, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+        await asyncio.sleep(max(0.0, start + i * chunk_ms / 1000 - time.monotonic()))
+        async for _ in vad.process_audio_chunk(pcm[offset:offset + chunk_bytes]):
+            partials_before_final = len(partials)
+            transcript = await recognizer.finish_utterance()
+            latencies.append(recognizer.last_final_latency_s)
+            print(f"SIM: final '{transcript}' after {partials_before_final} partials")
+            partials.clear()
+
+    print(
+        f"SIM: {len(latencies)} utterances, endpoint-to-final "
+        f"max={max(latencies) * 1000:.0f}ms mean={sum(latencies) / len(latencies) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(_simulate())
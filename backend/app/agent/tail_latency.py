@@ -0,0 +1,196 @@
+import time
+import random
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from app.agent.deadline_constants import (
+    HEDGE_PERCENTILE, HEDGE_MIN_DELAY_S, HEDGE_DEFAULT_DELAY_S, HEDGE_MIN_SAMPLES,
+    LATENCY_WINDOW_SIZE, MAX_HEDGES, MAX_RETRIES, RETRY_BACKOFF_BASE_S, RETRY_BACKOFF_MAX_S,
+    TRANSIENT_HTTP_STATUSES, UPSTREAM_EXECUTOR_WORKERS
+)
+
+# Dedicated pool for blocking upstream SDK calls, so they neither compete with nor
+# exhaust the event loop's default executor.
+upstream_executor = ThreadPoolExecutor(max_workers=UPSTREAM_EXECUTOR_WORKERS, thread_name_prefix="upstream")
+
+# monotonic() deadline of the innermost call_with_deadline; attempts and their hedges inherit it.
+_current_deadline: ContextVar[float | None] = ContextVar("upstream_deadline", default=None)
+
+
+class DeadlineExceededError(asyncio.TimeoutError):
+    """Raised when a call did not succeed within its deadline."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether another attempt at the call that raised `error` might succeed."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    for attr in ("code", "status_code"):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status in TRANSIENT_HTTP_STATUSES
+    return False
+
+
+def rpc_timeout() -> float | None:
+    """Seconds left before the enclosing call_with_deadline gives up, to pass as an SDK call's timeout.
+
+    Without it a hung RPC would keep its thread, and any scheduler slot held around it, after
+    the caller has given up. Returns None outside call_with_deadline; raises
+    DeadlineExceededError if no time is left.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError("Deadline exceeded before the upstream call was sent.")
+    return remaining
+
+
+async def run_blocking(func: Callable, *args):
+    """Runs `func(*args)` on `upstream_executor` and returns its result.
+
+    A thread cannot be interrupted, so if the caller is cancelled (e.g. a losing hedge)
+    this keeps waiting until the thread returns before re-raising. A scheduler slot held
+    around the call therefore stays held while the upstream is actually being called.
+    """
+    future = asyncio.get_running_loop().run_in_executor(upstream_executor, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait({future})
+            except asyncio.CancelledError:
+                pass
+        raise
+
+
+class LatencyTracker:
+    """Sliding window of recent successful latencies for one upstream."""
+
+    def __init__(self, window_size: int = LATENCY_WINDOW_SIZE):
+        self.samples: deque[float] = deque(maxlen=window_size)
+
+    def record(self, latency_s: float) -> None:
+        self.samples.append(latency_s)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class CallPolicy:
+    """Deadline, hedging and retry settings for calls to one upstream."""
+
+    def __init__(
+            self,
+            deadline_s: float,
+            hedge: bool = True,
+            max_hedges: int = MAX_HEDGES,
+            hedge_percentile: float = HEDGE_PERCENTILE,
+            max_retries: int = MAX_RETRIES,
+            tracker: LatencyTracker | None = None,
+            hedge_guard: Callable[[], bool] | None = None
+    ):
+        self.deadline_s = deadline_s
+        self.hedge = hedge
+        self.max_hedges = max_hedges
+        self.hedge_percentile = hedge_percentile
+        self.max_retries = max_retries
+        self.tracker = tracker or LatencyTracker()
+        # Checked before each hedge; lets callers stop duplicating work under overload.
+        self.hedge_guard = hedge_guard
+
+    def hedge_delay(self) -> float:
+        if len(self.tracker.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY_S
+        return max(HEDGE_MIN_DELAY_S, self.tracker.percentile(self.hedge_percentile))
+
+
+async def call_with_deadline(name: str, attempt: Callable[[], Awaitable], policy: CallPolicy):
+    """Runs `attempt()` under the policy's deadline, hedging slow attempts and retrying failed ones.
+
+    `attempt` is called once per try and must be safe to run more than once
+    concurrently. Losing attempts are cancelled. Only transient errors (see
+    `is_transient`) are retried. Raises DeadlineExceededError if no attempt succeeds
+    in time, otherwise the first permanent error or the last error once retries run out.
+    Inside `attempt`, `rpc_timeout()` gives the time left for the SDK call itself.
+    """
+    deadline = time.monotonic() + policy.deadline_s
+    token = _current_deadline.set(deadline)
+    try:
+        return await _call_with_retries(name, attempt, policy, deadline)
+    finally:
+        _current_deadline.reset(token)
+
+
+async def _call_with_retries(name: str, attempt: Callable[[], Awaitable], policy: CallPolicy, deadline: float):
+    last_error: BaseException | None = None
+
+    for retry in range(policy.max_retries + 1):
+        if retry:
+            backoff = random.uniform(0, min(RETRY_BACKOFF_MAX_S, RETRY_BACKOFF_BASE_S * 2 ** (retry - 1)))
+            if time.monotonic() + backoff >= deadline:
+                break
+            print(f"Upstream {name}: Retry {retry}/{policy.max_retries} after {backoff * 1000:.0f}ms: {last_error}")
+            await asyncio.sleep(backoff)
+
+        try:
+            return await _hedged_attempt(name, attempt, policy, deadline)
+        except DeadlineExceededError:
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            last_error = e
+
+    if last_error is not None:
+        raise last_error
+    raise DeadlineExceededError(f"Upstream {name}: deadline of {policy.deadline_s}s exceeded.")
+
+
+async def _hedged_attempt(name: str, attempt: Callable[[], Awaitable], policy: CallPolicy, deadline: float):
+    async def timed():
+        start = time.monotonic()
+        result = await attempt()
+        policy.tracker.record(time.monotonic() - start)
+        return result
+
+    tasks = {asyncio.create_task(timed())}
+    hedges_left = policy.max_hedges if policy.hedge else 0
+    last_error: BaseException | None = None
+    try:
+        while tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f"Upstream {name}: deadline of {policy.deadline_s}s exceeded.")
+
+            timeout = min(remaining, policy.hedge_delay()) if hedges_left else remaining
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                if not is_transient(last_error):
+                    # A duplicate of the same request would fail the same way.
+                    raise last_error
+
+            hedge_due = timeout < remaining  # otherwise the wait ended at the deadline
+            if not done and hedges_left and hedge_due and (policy.hedge_guard is None or policy.hedge_guard()):
+                hedges_left -= 1
+                print(f"Upstream {name}: No response after {timeout * 1000:.0f}ms, sending hedged request.")
+                tasks.add(asyncio.create_task(timed()))
+
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
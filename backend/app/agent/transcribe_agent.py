@@ -1,15 +1,27 @@
 import os
 import asyncio
+import functools
 import tempfile
 from typing import Optional
 
-import google.generativeai as genai
 from app.agent.vad_constants import SAMPLE_RATE, CHANNELS, BYTES_PER_SAMPLE
+from app.agent.scheduler_constants import UPSTREAM_GEMINI, PRIORITY_TRANSCRIPTION, PRIORITY_BACKGROUND
+from app.agent.upstream_scheduler import upstream_scheduler
+from app.agent.deadline_constants import TRANSCRIBE_DEADLINE_S
+from app.agent.tail_latency import CallPolicy, call_with_deadline, run_blocking, rpc_timeout
 
 EXPECTED_MIME_TYPE = f'audio/l16;rate={SAMPLE_RATE};channels={CHANNELS}'
 
+# Shared by all agents so the hedge delay tracks process-wide transcription latency.
+TRANSCRIBE_CALL_POLICY = CallPolicy(
+    deadline_s=TRANSCRIBE_DEADLINE_S, hedge_guard=lambda: not upstream_scheduler.is_overloaded()
+)
+
 
 class TranscribeAgent:
+    # Background deletes of uploaded files; referenced here so they are not garbage-collected.
+    _cleanup_tasks: set[asyncio.Task] = set()
+
     def __init__(
             self,
             api_key: Optional[str] = None,
@@ -20,7 +32,11 @@ class TranscribeAgent:
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY not found. Cannot initialize GoogleGeminiAgent.")
 
+        # Imported here rather than at module level: the SDK takes seconds to import.
+        import google.generativeai as genai
+
         try:
+            self.genai = genai
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel(model_name)
             self.prompt = prompt
@@ -42,25 +58,16 @@ class TranscribeAgent:
             f"Agent: Audio format: Raw PCM, Sample Rate={SAMPLE_RATE}, Channels={CHANNELS}. Mime: {EXPECTED_MIME_TYPE}")
 
         temp_file_path = None
-        uploaded_file_name_for_cleanup = None
+        uploaded_files: list[str] = []
 
         try:
             with tempfile.NamedTemporaryFile(delete=False, suffix=".raw") as tmpfile:
                 tmpfile.write(audio_bytes)
                 temp_file_path = tmpfile.name
 
-            audio_file_for_gemini = await asyncio.to_thread(
-                genai.upload_file,
-                path=temp_file_path,
-                mime_type=EXPECTED_MIME_TYPE,
-                display_name=f"session-audio-chunk-{os.path.basename(temp_file_path)}"
-            )
-            uploaded_file_name_for_cleanup = audio_file_for_gemini.name
-            print(
-                f"Agent: Audio file uploaded to Gemini: {audio_file_for_gemini.name} ({audio_file_for_gemini.display_name})")
-
-            response = await self.model.generate_content_async(
-                [self.prompt, audio_file_for_gemini]
+            response = await call_with_deadline(
+                "gemini-transcribe", lambda: self._transcribe_file(temp_file_path, uploaded_files),
+                TRANSCRIBE_CALL_POLICY
             )
 
             if not response.parts:
@@ -90,10 +97,43 @@ class TranscribeAgent:
                     os.remove(temp_file_path)
                 except Exception as e_rem:
                     print(f"Agent: Error deleting temporary local file {temp_file_path}: {e_rem}")
+            # Outside the deadline, and nobody waits on it: the delete queues behind every other Gemini call.
+            for name in uploaded_files:
+                task = asyncio.create_task(self._delete_uploaded_file(name))
+                self._cleanup_tasks.add(task)
+                task.add_done_callback(self._cleanup_tasks.discard)
+
+    async def _transcribe_file(self, temp_file_path: str, uploaded_files: list[str]):
+        """One upload-and-generate attempt. May run concurrently with a hedged duplicate.
+
+        Appends the name of the uploaded file to `uploaded_files` for the caller to delete.
+        """
+        # An upload cancelled mid-flight still completes in its thread, keeping the
+        # slot until it does; Gemini expires such orphaned files on its own. upload_file
+        # takes no timeout: a hung upload holds its thread and slot until the connection drops.
+        async with upstream_scheduler.slot(UPSTREAM_GEMINI, PRIORITY_TRANSCRIPTION):
+            audio_file_for_gemini = await run_blocking(
+                functools.partial(
+                    self.genai.upload_file,
+                    path=temp_file_path,
+                    mime_type=EXPECTED_MIME_TYPE,
+                    display_name=f"session-audio-chunk-{os.path.basename(temp_file_path)}"
+                )
+            )
+        uploaded_files.append(audio_file_for_gemini.name)
+        print(
+            f"Agent: Audio file uploaded to Gemini: {audio_file_for_gemini.name} ({audio_file_for_gemini.display_name})")
 
-            if uploaded_file_name_for_cleanup:
-                try:
-                    await asyncio.to_thread(genai.delete_file, uploaded_file_name_for_cleanup)
-                    print(f"Agent: Deleted uploaded file from Gemini: {uploaded_file_name_for_cleanup}")
-                except Exception as e_del_gemini:
-                    print(f"Agent: Error deleting file {uploaded_file_name_for_cleanup} from Gemini: {e_del_gemini}")
+        async with upstream_scheduler.slot(UPSTREAM_GEMINI, PRIORITY_TRANSCRIPTION):
+            return await self.model.generate_content_async(
+                [self.prompt, audio_file_for_gemini],
+                request_options={"timeout": rpc_timeout()}
+            )
+
+    async def _delete_uploaded_file(self, name: str) -> None:
+        try:
+            async with upstream_scheduler.slot(UPSTREAM_GEMINI, PRIORITY_BACKGROUND):
+                await run_blocking(self.genai.delete_file, name)
+            print(f"Agent: Deleted uploaded file from Gemini: {name}")
+        except Exception as e_del_gemini:
+            print(f"Agent: Error deleting file {name} from Gemini: {e_del_gemini}")
@@ -1,4 +1,10 @@
 from app.agent.transcribe_agent import TranscribeAgent
+from app.agent.audio_input import AudioInputConverter
+from app.agent.outbound_audio import OutboundAudioScheduler
+from app.agent.capture import CaptureWriter
+from app.agent.scheduler_constants import PRIORITY_FIRST_SENTENCE_TTS
+from app.agent.scaling_constants import SESSION_MAX_TURNS
+from app.agent.session_store import get_session_store
 from fastapi import WebSocket
 from app.agent.real_time_answer import answer_with_pdf
 
@@ -6,38 +12,83 @@ from app.agent.real_time_answer import TTSStreamer
 
 PDF_PATH = "./app/data/attention_is_all_you_need.pdf"
 
-async def transcribe(transcribe_agent: TranscribeAgent, socket: WebSocket, id: str) -> None:
+async def transcribe(
+        transcribe_agent: TranscribeAgent,
+        socket: WebSocket,
+        id: str,
+        input_converter: AudioInputConverter | None = None,
+        capture: CaptureWriter | None = None
+) -> None:
+    outbound = OutboundAudioScheduler(id, socket.send_bytes)
+    outbound.start()
+    try:
+        await _converse(transcribe_agent, socket, id, input_converter, outbound, capture)
+    finally:
+        await outbound.close(drain=False)
+
+
+async def _converse(
+        transcribe_agent: TranscribeAgent,
+        socket: WebSocket,
+        id: str,
+        input_converter: AudioInputConverter | None,
+        outbound: OutboundAudioScheduler,
+        capture: CaptureWriter | None
+) -> None:
+    session_store = get_session_store()
+    session_state = await session_store.load(id) or {"turns": []}
+    if session_state["turns"]:
+        print(f"Client #{id}: Resuming session with {len(session_state['turns'])} earlier turns.")
+
     try:
         tts_streamer = TTSStreamer()
         greeting_text = "Hello, how can I help you today?"
 
         print(f"Client #{id}: Synthesizing greeting: \"{greeting_text}\"")
-        greeting_audio_bytes = await tts_streamer.synthesize(greeting_text)
+        greeting_audio_bytes = await tts_streamer.synthesize(greeting_text, PRIORITY_FIRST_SENTENCE_TTS)
 
-        await socket.send_bytes(greeting_audio_bytes)
-        print(f"Client #{id}: Sent greeting audio.")
+        if capture:
+            capture.record_outbound_event({"event": "greeting", "text": greeting_text})
+            capture.record_outbound_audio(greeting_audio_bytes)
+        await outbound.enqueue(greeting_audio_bytes)
+        print(f"Client #{id}: Queued greeting audio.")
 
     except Exception as e:
         print(f"Client #{id}: Error during initial greeting: {e}")
 
     while True:
-        raw_pcm_audio_chunk = await socket.receive_bytes()
-        if not raw_pcm_audio_chunk:
+        raw_audio_chunk = await socket.receive_bytes()
+        if not raw_audio_chunk:
             print(f"Client #{id}: Received empty data, continuing...")
             continue
 
+        if capture:
+            capture.record_audio_in(raw_audio_chunk)
+        raw_pcm_audio_chunk = input_converter.convert(raw_audio_chunk) if input_converter else raw_audio_chunk
+
         try:
             # transcript = await transcribe_agent.transcribe_audio_chunk(raw_pcm_audio_chunk)
             transcript = "Hello, what is the role of the decoder in transformer models?"
             if transcript:
                 print(f"Client #{id}: got transcript: \"{transcript}\"")
-                async for part in answer_with_pdf(transcript, PDF_PATH):
+                if capture:
+                    capture.record_transcript(transcript)
+                answer_text = []
+                async for part in answer_with_pdf(transcript, PDF_PATH, history=session_state["turns"]):
                     text = part["text_chunk"]
+                    answer_text.append(text)
                     audio_bytes = part["audio_chunk"]
 
                     print(text, end="", flush=True)
 
-                    await socket.send_bytes(audio_bytes)
+                    if capture:
+                        capture.record_outbound_event({"event": "answer_text", "text": text})
+                        capture.record_outbound_audio(audio_bytes)
+                    await outbound.enqueue(audio_bytes)
+
+                session_state["turns"].append({"question": transcript, "answer": "".join(answer_text)})
+                session_state["turns"] = session_state["turns"][-SESSION_MAX_TURNS:]
+                await session_store.save(id, session_state)
             else:
                 print(f"Client #{id}: Agent returned empty transcript.")
         except Exception as e:
@@ -0,0 +1,350 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+from app.agent.scheduler_constants import (
+    UPSTREAM_LIMITS, UPSTREAM_GEMINI, UPSTREAM_TTS,
+    PRIORITY_TRANSCRIPTION, PRIORITY_FIRST_SENTENCE_TTS, PRIORITY_TTS,
+    MAX_ACTIVE_SESSIONS, MAX_WAITING_SESSIONS, OVERLOAD_QUEUE_DEPTH, SESSION_ADMISSION_TIMEOUT_S
+)
+from app.agent.scaling_constants import WORKER_COUNT_ENV, WORKER_ID_ENV
+
+
+ADMISSION_POLL_INTERVAL_S = 0.25
+
+
+class SchedulerSaturatedError(Exception):
+    """Raised when a new session is shed because the upstreams are saturated."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate_per_s)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        self._refill()
+        return max(0.0, (1.0 - self.tokens) / self.rate_per_s)
+
+
+class UpstreamGate:
+    """Rate limit, concurrency cap and priority queue for a single upstream service.
+
+    Waiters are granted strictly by (priority, arrival order) whenever both a token
+    and a concurrency slot are available.
+    """
+
+    def __init__(self, name: str, rate_per_s: float, burst: int, max_concurrency: int):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._refill_timer: asyncio.TimerHandle | None = None
+
+        self.granted = 0
+        self.total_wait_s = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        wait_start = time.monotonic()
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Granted just as the waiter was cancelled: hand the slot back.
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        self.total_wait_s += time.monotonic() - wait_start
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.in_flight < self.max_concurrency:
+            _, _, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self.bucket.try_take():
+                self._schedule_refill()
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            self.granted += 1
+            fut.set_result(None)
+
+    def _schedule_refill(self) -> None:
+        if self._refill_timer is not None and not self._refill_timer.cancelled():
+            return
+        loop = asyncio.get_running_loop()
+
+        def on_refill():
+            self._refill_timer = None
+            self._dispatch()
+
+        self._refill_timer = loop.call_later(self.bucket.seconds_until_token(), on_refill)
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "granted": self.granted,
+            "avg_wait_ms": round(self.total_wait_s / self.granted * 1000, 1) if self.granted else 0.0,
+        }
+
+
+class UpstreamScheduler:
+    """Process-wide admission control for calls to Gemini and Cloud TTS.
+
+    Every upstream call goes through `slot(upstream, priority)`, which waits for the
+    upstream's token bucket, concurrency cap and priority order before entering.
+    New conversations go through `session(session_id)`, which queues or sheds them
+    while the upstreams are saturated so existing sessions keep their latency.
+    """
+
+    def __init__(
+            self,
+            limits: dict,
+            max_active_sessions: int = MAX_ACTIVE_SESSIONS,
+            max_waiting_sessions: int = MAX_WAITING_SESSIONS,
+            overload_queue_depth: int = OVERLOAD_QUEUE_DEPTH,
+            admission_timeout_s: float = SESSION_ADMISSION_TIMEOUT_S
+    ):
+        self.gates = {name: UpstreamGate(name, **cfg) for name, cfg in limits.items()}
+        self.max_active_sessions = max_active_sessions
+        self.max_waiting_sessions = max_waiting_sessions
+        self.overload_queue_depth = overload_queue_depth
+        self.admission_timeout_s = admission_timeout_s
+
+        self.active_sessions = 0
+        self._session_waiters: list[object] = []
+        self._admission_changed = asyncio.Event()
+        self.sessions_shed = 0
+
+    @asynccontextmanager
+    async def slot(self, upstream: str, priority: int):
+        gate = self.gates[upstream]
+        await gate.acquire(priority)
+        try:
+            yield
+        finally:
+            gate.release()
+
+    async def run(self, upstream: str, priority: int, func, *args, **kwargs):
+        """Awaits `func(*args, **kwargs)` inside a slot of `upstream`."""
+        async with self.slot(upstream, priority):
+            return await func(*args, **kwargs)
+
+    def is_overloaded(self) -> bool:
+        return any(gate.queue_depth > self.overload_queue_depth for gate in self.gates.values())
+
+    def _can_admit(self) -> bool:
+        return self.active_sessions < self.max_active_sessions and not self.is_overloaded()
+
+    @asynccontextmanager
+    async def session(self, session_id: str):
+        if self._session_waiters or not self._can_admit():
+            if len(self._session_waiters) >= self.max_waiting_sessions:
+                self.sessions_shed += 1
+                raise SchedulerSaturatedError(f"Server busy, session {session_id} rejected.")
+
+            print(f"Scheduler: Session {session_id} queued for admission.")
+            ticket = object()
+            self._session_waiters.append(ticket)
+            try:
+                await asyncio.wait_for(self._wait_for_admission(ticket), self.admission_timeout_s)
+            except asyncio.TimeoutError:
+                self.sessions_shed += 1
+                raise SchedulerSaturatedError(f"Server busy, session {session_id} timed out waiting for admission.")
+            finally:
+                self._session_waiters.remove(ticket)
+                self._admission_changed.set()
+
+        self.active_sessions += 1
+        try:
+            yield
+        finally:
+            self.active_sessions -= 1
+            self._admission_changed.set()
+
+    async def _wait_for_admission(self, ticket: object) -> None:
+        # Queued sessions are admitted in arrival order. Upstream queues drain without
+        # any session ending, so the condition is also re-checked on a short poll.
+        while not (self._session_waiters[0] is ticket and self._can_admit()):
+            self._admission_changed.clear()
+            try:
+                await asyncio.wait_for(self._admission_changed.wait(), ADMISSION_POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def metrics(self) -> dict:
+        return {
+            "active_sessions": self.active_sessions,
+            "waiting_sessions": len(self._session_waiters),
+            "sessions_shed": self.sessions_shed,
+            "upstreams": {name: gate.metrics() for name, gate in self.gates.items()},
+        }
+
+
+def _share(total: int, workers: int, worker_id: int) -> int:
+    # The first `total % workers` workers take one extra so the shares add up to `total`.
+    # Every worker keeps at least 1, or sessions routed to it could never call the upstream.
+    return max(1, total // workers + (1 if worker_id % workers < total % workers else 0))
+
+
+def per_worker_limits(limits: dict, workers: int, worker_id: int = 0) -> dict:
+    """Worker `worker_id`'s share of project-wide upstream limits split between `workers` processes.
+
+    Shares add up to the project-wide limits, except that burst and concurrency never go
+    below 1 per worker: see `oversubscribed_limits`.
+    """
+    if workers <= 1:
+        return limits
+    return {
+        name: {
+            "rate_per_s": cfg["rate_per_s"] / workers,
+            "burst": _share(cfg["burst"], workers, worker_id),
+            "max_concurrency": _share(cfg["max_concurrency"], workers, worker_id),
+        }
+        for name, cfg in limits.items()
+    }
+
+
+def oversubscribed_limits(limits: dict, workers: int) -> list[str]:
+    """Limits smaller than the worker count, which `workers` processes together exceed."""
+    return [
+        f"{name} {field} ({cfg[field]} < {workers} workers)"
+        for name, cfg in limits.items()
+        for field in ("burst", "max_concurrency")
+        if cfg[field] < workers
+    ]
+
+
+# WORKER_COUNT and WORKER_ID are set by the multi-worker launcher on each worker's environment.
+upstream_scheduler = UpstreamScheduler(per_worker_limits(
+    UPSTREAM_LIMITS, int(os.getenv(WORKER_COUNT_ENV, "1")), int(os.getenv(WORKER_ID_ENV, "0"))
+))
+
+
+class _QuotaExceeded(Exception):
+    pass
+
+
+class _FakeRateLimitedUpstream:
+    """Stand-in for a quota-limited API: fails calls above `quota_per_s` in a sliding second."""
+
+    def __init__(self, quota_per_s: int, latency_s: float):
+        self.quota_per_s = quota_per_s
+        self.latency_s = latency_s
+        self.calls: list[float] = []
+        self.rejected = 0
+
+    async def call(self):
+        now = time.monotonic()
+        self.calls = [t for t in self.calls if now - t < 1.0]
+        if len(self.calls) >= self.quota_per_s:
+            self.rejected += 1
+            await asyncio.sleep(0.01)
+            raise _QuotaExceeded()
+        self.calls.append(now)
+        await asyncio.sleep(self.latency_s * random.uniform(0.8, 1.5))
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def _simulate(use_scheduler: bool, num_sessions: int = 60, arrival_window_s: float = 3.0):
+    """A burst of sessions arriving at ~2.5x the upstream quota.
+
+    Each session transcribes once, then synthesizes its first sentence and three more.
+    Without the scheduler, callers retry quota errors with a short random backoff.
+    """
+    random.seed(0)
+    gemini = _FakeRateLimitedUpstream(quota_per_s=20, latency_s=0.15)
+    tts = _FakeRateLimitedUpstream(quota_per_s=30, latency_s=0.10)
+    scheduler = UpstreamScheduler(
+        {
+            UPSTREAM_GEMINI: {"rate_per_s": 18.0, "burst": 2, "max_concurrency": 8},
+            UPSTREAM_TTS: {"rate_per_s": 27.0, "burst": 3, "max_concurrency": 8},
+        },
+        max_active_sessions=8, max_waiting_sessions=8, admission_timeout_s=2.0
+    )
+    first_audio: list[float] = []
+    answer_done: list[float] = []
+    shed = 0
+
+    async def call(upstream, fake, priority):
+        while True:
+            try:
+                if use_scheduler:
+                    return await scheduler.run(upstream, priority, fake.call)
+                return await fake.call()
+            except _QuotaExceeded:
+                await asyncio.sleep(random.uniform(0.05, 0.2))
+
+    async def conversation(start):
+        await call(UPSTREAM_GEMINI, gemini, PRIORITY_TRANSCRIPTION)
+        await call(UPSTREAM_TTS, tts, PRIORITY_FIRST_SENTENCE_TTS)
+        first_audio.append(time.monotonic() - start)
+        await asyncio.gather(*(call(UPSTREAM_TTS, tts, PRIORITY_TTS) for _ in range(3)))
+        answer_done.append(time.monotonic() - start)
+
+    async def session(index):
+        nonlocal shed
+        await asyncio.sleep(arrival_window_s * index / num_sessions)
+        start = time.monotonic()
+        try:
+            if use_scheduler:
+                async with scheduler.session(str(index)):
+                    await conversation(start)
+            else:
+                await conversation(start)
+        except SchedulerSaturatedError:
+            shed += 1
+
+    await asyncio.gather(*(session(i) for i in range(num_sessions)))
+    print(
+        f"scheduler={'on ' if use_scheduler else 'off'}: served={len(first_audio)} shed={shed} | "
+        f"time to first audio p50={_percentile(first_audio, 0.5) * 1000:.0f}ms "
+        f"p95={_percentile(first_audio, 0.95) * 1000:.0f}ms | "
+        f"full answer p95={_percentile(answer_done, 0.95) * 1000:.0f}ms | "
+        f"quota errors gemini={gemini.rejected} tts={tts.rejected}"
+    )
+
+
+async def _simulation():
+    await _simulate(use_scheduler=False)
+    await _simulate(use_scheduler=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(_simulation())
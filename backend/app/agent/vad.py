@@ -1,13 +1,37 @@
 import webrtcvad
 
+from app.agent.capture import CaptureWriter
 from app.agent.vad_constants import (
     SAMPLE_RATE, BYTES_PER_FRAME, VAD_AGGRESSIVENESS,
     NUM_SILENT_FRAMES_EOS_THRESHOLD, MIN_SPEECH_FRAMES_THRESHOLD
 )
 
+class SpeechListener:
+    """Receives speech as it is detected, before the utterance is complete.
+
+    Used by streaming recognition; the defaults do nothing.
+    """
+
+    async def on_speech_start(self) -> None:
+        pass
+
+    async def on_speech_frame(self, frame: bytes, is_speech: bool = True) -> None:
+        pass
+
+    async def on_speech_discard(self) -> None:
+        pass
+
+
 class VoiceActivityDetector:
-    def __init__(self, session_id: str):
+    def __init__(
+            self,
+            session_id: str,
+            capture: CaptureWriter | None = None,
+            listener: SpeechListener | None = None
+    ):
         self.session_id = session_id
+        self.capture = capture
+        self.listener = listener or SpeechListener()
         try:
             self.vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
         except Exception as e:
@@ -38,6 +62,8 @@ class VoiceActivityDetector:
             except Exception as e:
                 print(
                     f"VAD for Client #{self.session_id}: Error processing frame with webrtcvad: {e}. Frame length: {len(frame)}. Clearing buffer.")
+                if self.is_speaking:
+                    await self.listener.on_speech_discard()
                 self.audio_buffer.clear()
                 self.speech_frames_buffer.clear()
                 self.is_speaking = False
@@ -48,13 +74,18 @@ class VoiceActivityDetector:
                 if not self.is_speaking:
                     print(f"VAD for Client #{self.session_id}: Speech started.")
                     self.is_speaking = True
+                    if self.capture:
+                        self.capture.record_vad("speech_start")
+                    await self.listener.on_speech_start()
 
                 self.speech_frames_buffer.extend(frame)
                 self.consecutive_silent_frames = 0
+                await self.listener.on_speech_frame(bytes(frame), is_speech=True)
             else:
                 if self.is_speaking:
                     self.speech_frames_buffer.extend(frame)
                     self.consecutive_silent_frames += 1
+                    await self.listener.on_speech_frame(bytes(frame), is_speech=False)
 
                     if self.consecutive_silent_frames >= NUM_SILENT_FRAMES_EOS_THRESHOLD:
                         print(
@@ -68,13 +99,23 @@ class VoiceActivityDetector:
 
                             if num_actual_speech_frames >= MIN_SPEECH_FRAMES_THRESHOLD:
                                 speech_segment_to_yield = self.speech_frames_buffer[:speech_part_byte_length]
+                                if self.capture:
+                                    self.capture.record_vad(
+                                        "speech_end", bytes=speech_part_byte_length, frames=num_actual_speech_frames
+                                    )
                                 yield speech_segment_to_yield.copy()
                                 print(
                                     f"VAD for Client #{self.session_id}: Yielded {len(speech_segment_to_yield)} bytes ({num_actual_speech_frames} frames) of speech.")
                             else:
+                                if self.capture:
+                                    self.capture.record_vad("discard", reason="too_short", frames=num_actual_speech_frames)
+                                await self.listener.on_speech_discard()
                                 print(
                                     f"VAD for Client #{self.session_id}: Speech segment too short ({num_actual_speech_frames} frames < {MIN_SPEECH_FRAMES_THRESHOLD} min), discarding.")
                         else:
+                            if self.capture:
+                                self.capture.record_vad("discard", reason="silence")
+                            await self.listener.on_speech_discard()
                             print(
                                 f"VAD for Client #{self.session_id}: Buffer contains mostly/only silence after speech start, discarding.")
 
@@ -90,10 +131,15 @@ class VoiceActivityDetector:
 
             num_frames_in_buffer = len(self.speech_frames_buffer) // BYTES_PER_FRAME
             if num_frames_in_buffer >= MIN_SPEECH_FRAMES_THRESHOLD:
+                if self.capture:
+                    self.capture.record_vad(
+                        "speech_end", bytes=len(self.speech_frames_buffer), frames=num_frames_in_buffer, cleanup=True
+                    )
                 yield self.speech_frames_buffer.copy()
                 print(
                     f"VAD for Client #{self.session_id}: Yielded {len(self.speech_frames_buffer)} bytes ({num_frames_in_buffer} frames) from cleanup.")
             else:
+                await self.listener.on_speech_discard()
                 print(
                     f"VAD for Client #{self.session_id}: Remaining buffer too short ({num_frames_in_buffer} frames) during cleanup, discarding.")
 
@@ -1,3 +1,9 @@
+import os
+import time
+import importlib
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.flashcards import router as flashcards_router
@@ -6,10 +12,44 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# SDKs the request path imports lazily. They are imported in the background once the
+# server is up, so /health answers immediately and the first session does not pay for them.
+WARMUP_MODULES = (
+    "google.generativeai",
+    "google.cloud.texttospeech",
+    "google.adk.agents",
+    "google.adk.runners",
+    "google.adk.tools",
+    "google.adk.sessions.in_memory_session_service",
+    "google.genai.types",
+    "pypdf",
+    "numpy",
+    "app.agent.resampler",
+)
+
+
+def _warm_up():
+    start = time.perf_counter()
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warm-up: Failed to import {name}: {e}")
+    print(f"Warm-up: Imported {len(WARMUP_MODULES)} modules in {time.perf_counter() - start:.2f}s.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("STARTUP_WARMUP", "1") != "0":
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    yield
+
+
 app = FastAPI(
     title="Main service",
     description="All of the routes are in this service",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -26,4 +66,4 @@ app.include_router(stream_router, prefix="/stream")
 @app.get("/health")
 def health_check():
     """Health check endpoint for monitoring"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
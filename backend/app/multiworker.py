@@ -0,0 +1,108 @@
+"""
+Multi-worker deployment on one host.
+
+Starts N uvicorn workers on 127.0.0.1 ports WORKER_BASE_PORT.. and an affinity router on
+the public port that sends every connection for a session_id to the same worker.
+Workers share extracted documents, the TTS cache and (by default) the session store
+through the host-local shared state directory, and split the upstream rate limits.
+Workers that exit are restarted.
+
+    python -m app.multiworker --workers 4 --port 8000
+"""
+import os
+import sys
+import signal
+import asyncio
+import argparse
+import subprocess
+
+from app.agent.scaling_constants import (
+    WORKER_BASE_PORT, WORKER_COUNT_ENV, WORKER_ID_ENV, WORKER_RESTART_DELAY_S, SESSION_STORE_ENV
+)
+from app.agent.scheduler_constants import UPSTREAM_LIMITS
+from app.agent.session_affinity import AffinityRouter
+from app.agent.upstream_scheduler import oversubscribed_limits
+from app.agent.shared_state import shared_state_dir
+
+WORKER_HOST = "127.0.0.1"
+
+
+class WorkerPool:
+    def __init__(self, count: int, base_port: int, quiet: bool = False, app: str = "app.main:app"):
+        self.count = count
+        self.app = app
+        self.ports = [base_port + i for i in range(count)]
+        self.quiet = quiet
+        self.processes: list[subprocess.Popen | None] = [None] * count
+        self.env = {**os.environ, WORKER_COUNT_ENV: str(count)}
+        self.env.setdefault(SESSION_STORE_ENV, "file")
+
+    def _spawn(self, index: int) -> subprocess.Popen:
+        output = subprocess.DEVNULL if self.quiet else None
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--host", WORKER_HOST, "--port", str(self.ports[index])],
+            env={**self.env, WORKER_ID_ENV: str(index)}, stdout=output, stderr=output
+        )
+
+    def start(self) -> None:
+        for i in range(self.count):
+            self.processes[i] = self._spawn(i)
+        print(f"Workers: Started {self.count} on ports {self.ports[0]}-{self.ports[-1]}, "
+              f"shared state in {shared_state_dir()}, session store '{self.env[SESSION_STORE_ENV]}'.")
+        oversubscribed = oversubscribed_limits(UPSTREAM_LIMITS, self.count)
+        if oversubscribed:
+            print(f"Workers: Warning: each worker keeps at least 1, so together they exceed "
+                  f"{', '.join(oversubscribed)}. Run fewer workers to stay within these limits.")
+
+    async def supervise(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_RESTART_DELAY_S)
+            for i, process in enumerate(self.processes):
+                if process.poll() is not None:
+                    print(f"Workers: Worker {i} exited with code {process.returncode}, restarting.")
+                    self.processes[i] = self._spawn(i)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process and process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            if process:
+                process.wait()
+
+
+async def serve(args) -> None:
+    pool = WorkerPool(args.workers, args.worker_base_port, args.quiet, args.app)
+    router = AffinityRouter([(WORKER_HOST, port) for port in pool.ports])
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopped.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    pool.start()
+    tasks = [asyncio.create_task(pool.supervise()), asyncio.create_task(router.serve(args.host, args.port))]
+    try:
+        await stopped.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        pool.stop()
+        print("Workers: Stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several workers behind a session-affinity router.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--worker-base-port", type=int, default=WORKER_BASE_PORT)
+    parser.add_argument("--quiet", action="store_true", help="Discard worker output")
+    parser.add_argument("--app", default="app.main:app", help="ASGI app each worker serves")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
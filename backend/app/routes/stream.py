@@ -1,8 +1,14 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from app.agent.vad import VoiceActivityDetector
 from app.agent.vad_constants import (
-    SAMPLE_RATE, FRAME_DURATION_MS, BYTES_PER_FRAME, SILENCE_DURATION_MS_EOS
+    SAMPLE_RATE, CHANNELS, FRAME_DURATION_MS, BYTES_PER_FRAME, SILENCE_DURATION_MS_EOS
 )
+from app.agent.audio_input import AudioInputConverter, TARGET_SAMPLE_FORMAT
+from app.agent.outbound_audio import active_schedulers
+from app.agent.upstream_scheduler import upstream_scheduler, SchedulerSaturatedError
+from app.agent.capture import CaptureWriter
+from app.agent.recognition_constants import RECOGNITION_MODES, DEFAULT_RECOGNITION_MODE
+from app.agent.streaming_recognition import StreamingRecognizer
 from app.agent.transcribe_agent import TranscribeAgent
 import os
 from app.agent.transcription import transcribe
@@ -22,10 +28,74 @@ def get_transcribe_agent():
         print(f"Failed to initialize TranscribeAgent: {e}")
         raise
 
+
+async def open_input_converter(
+        websocket: WebSocket,
+        session_id: str,
+        sample_rate: int,
+        channels: int,
+        sample_format: str
+) -> AudioInputConverter | None:
+    """Builds the converter for the audio format the client declared in the query string.
+
+    Closes the socket and returns None if the declared format is not supported.
+    """
+    print(f"Client #{session_id}: EXPECTING RAW PCM ({sample_format}, {sample_rate}Hz, {channels}ch) from client.")
+    try:
+        return AudioInputConverter(session_id, sample_rate, channels, sample_format)
+    except ValueError as e:
+        print(f"Client #{session_id}: Rejected audio input format: {e}")
+        await websocket.close(code=1003, reason=f"Unsupported audio input: {e}")
+        return None
+
+
+def open_capture(
+        session_id: str,
+        endpoint: str,
+        enabled: bool,
+        input_converter: AudioInputConverter
+) -> CaptureWriter | None:
+    """
+    Starts recording the session's traffic when the client connected with `capture=true`
+    and the operator enabled capture by setting `STREAM_CAPTURE_DIR`.
+    """
+    if not enabled:
+        return None
+    try:
+        capture_writer = CaptureWriter.for_session(
+            session_id,
+            endpoint,
+            sample_rate=input_converter.sample_rate,
+            channels=input_converter.channels,
+            sample_format=input_converter.sample_format
+        )
+        if capture_writer is None:
+            print(f"Client #{session_id}: Capture requested but not enabled on this server.")
+        return capture_writer
+    except OSError as e:
+        print(f"Client #{session_id}: Could not open capture file, continuing without capture: {e}")
+        return None
+
+@router.get("/outbound/metrics")
+def get_outbound_metrics():
+    """Per-session outbound audio buffering and lag for the connected clients."""
+    return {session_id: scheduler.metrics() for session_id, scheduler in active_schedulers.items()}
+
+
+@router.get("/upstream/metrics")
+def get_upstream_metrics():
+    """Admission and per-upstream queueing state of the process-wide scheduler."""
+    return upstream_scheduler.metrics()
+
+
 @router.websocket("/discuss/{session_id}")
 async def ws_discucss(
         websocket: WebSocket,
         session_id: str,
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = CHANNELS,
+        sample_format: str = TARGET_SAMPLE_FORMAT,
+        capture: bool = False,
         transcribe_agent: TranscribeAgent = Depends(get_transcribe_agent)
 ):
     await websocket.accept()
@@ -34,19 +104,35 @@ async def ws_discucss(
         f"Client #{session_id} Audio Config: SR={SAMPLE_RATE}, FrameDur={FRAME_DURATION_MS}ms, "
         f"Bytes/Frame={BYTES_PER_FRAME}, EOS Silence={SILENCE_DURATION_MS_EOS}ms"
     )
-    print(f"Client #{session_id}: EXPECTING RAW PCM (16-bit, {SAMPLE_RATE}Hz, mono) from client.")
 
+    input_converter = await open_input_converter(websocket, session_id, sample_rate, channels, sample_format)
+    if input_converter is None:
+        return
+
+    capture_writer = open_capture(session_id, "discuss", capture, input_converter)
     try:
-        await transcribe(transcribe_agent, websocket, session_id)
+        async with upstream_scheduler.session(session_id):
+            await transcribe(transcribe_agent, websocket, session_id, input_converter, capture_writer)
+    except SchedulerSaturatedError as e:
+        print(f"Client #{session_id}: {e}")
+        await websocket.close(code=1013, reason="Server busy, try again later.")
     except WebSocketDisconnect:
         print(f"Client #{session_id} disconnected.")
     except Exception as e:
         print(f"Client #{session_id}: An unexpected error occurred: {e}")
+    finally:
+        if capture_writer:
+            capture_writer.close()
 
 @router.websocket("/test/transcribe/{session_id}")
 async def ws_stream_endpoint(
         websocket: WebSocket,
         session_id: str,
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = CHANNELS,
+        sample_format: str = TARGET_SAMPLE_FORMAT,
+        capture: bool = False,
+        recognition: str = DEFAULT_RECOGNITION_MODE,
         transcribe_agent: TranscribeAgent = Depends(get_transcribe_agent)
 ):
     await websocket.accept()
@@ -55,66 +141,119 @@ async def ws_stream_endpoint(
         f"Client #{session_id} Audio Config: SR={SAMPLE_RATE}, FrameDur={FRAME_DURATION_MS}ms, "
         f"Bytes/Frame={BYTES_PER_FRAME}, EOS Silence={SILENCE_DURATION_MS_EOS}ms"
     )
-    print(f"Client #{session_id}: EXPECTING RAW PCM (16-bit, {SAMPLE_RATE}Hz, mono) from client.")
+
+    if recognition not in RECOGNITION_MODES:
+        print(f"Client #{session_id}: Rejected unknown recognition mode '{recognition}'.")
+        await websocket.close(code=1003, reason=f"Unknown recognition mode: {recognition}")
+        return
+
+    input_converter = await open_input_converter(websocket, session_id, sample_rate, channels, sample_format)
+    if input_converter is None:
+        return
+
+    capture_writer = open_capture(session_id, "transcribe", capture, input_converter)
+
+    async def send_partial_transcript(text: str):
+        event = {"event": "partial_transcript", "session_id": session_id, "transcript": text}
+        if capture_writer:
+            capture_writer.record_outbound_event(event)
+        await websocket.send_json(event)
+
+    recognizer = None
+    if recognition == "streaming":
+        print(f"Client #{session_id}: Using streaming recognition over a live session.")
+        recognizer = StreamingRecognizer(session_id, on_partial=send_partial_transcript)
+
+    async def transcribe_segment(speech_segment: bytes) -> str:
+        if recognizer:
+            return await recognizer.finish_utterance()
+        return await transcribe_agent.transcribe_audio_chunk(speech_segment)
 
     try:
-        vad_handler = VoiceActivityDetector(session_id)
+        vad_handler = VoiceActivityDetector(session_id, capture_writer, recognizer)
     except Exception as e:
+        if capture_writer:
+            capture_writer.close()
         print(f"Client #{session_id}: Critical error initializing VAD: {e}")
         await websocket.close(code=1011, reason=f"Server VAD initialization error: {e}")
         return
 
-    try:
-        while True:
-            raw_pcm_audio_chunk = await websocket.receive_bytes()
-            if not raw_pcm_audio_chunk:
-                print(f"Client #{session_id}: Received empty data, continuing...")
-                continue
+    async def serve_session():
+        try:
+            while True:
+                raw_audio_chunk = await websocket.receive_bytes()
+                if not raw_audio_chunk:
+                    print(f"Client #{session_id}: Received empty data, continuing...")
+                    continue
 
-            async for speech_segment in vad_handler.process_audio_chunk(raw_pcm_audio_chunk):
+                if capture_writer:
+                    capture_writer.record_audio_in(raw_audio_chunk)
+                raw_pcm_audio_chunk = input_converter.convert(raw_audio_chunk)
+                async for speech_segment in vad_handler.process_audio_chunk(raw_pcm_audio_chunk):
+                    if speech_segment:
+                        print(
+                            f"Client #{session_id}: VAD yielded speech segment of {len(speech_segment)} bytes. Sending to agent.")
+                        try:
+                            transcript = await transcribe_segment(speech_segment)
+                            if transcript:
+                                event = {
+                                    "event": "transcript",
+                                    "session_id": session_id,
+                                    "transcript": transcript,
+                                    "audio_length_bytes": len(speech_segment)
+                                }
+                                if capture_writer:
+                                    capture_writer.record_transcript(transcript)
+                                    capture_writer.record_outbound_event(event)
+                                await websocket.send_json(event)
+                                print(f"Client #{session_id}: Sent transcript: \"{transcript}\"")
+                            else:
+                                print(f"Client #{session_id}: Agent returned empty transcript.")
+                        except Exception as e:
+                            print(f"Client #{session_id}: Error during transcription or sending: {e}")
+        except WebSocketDisconnect:
+            print(f"Client #{session_id} disconnected.")
+        except Exception as e:
+            print(f"Client #{session_id}: An unexpected error occurred: {e}")
+        finally:
+            print(f"Client #{session_id}: Cleaning up VAD resources...")
+            async for speech_segment in vad_handler.cleanup():
                 if speech_segment:
                     print(
-                        f"Client #{session_id}: VAD yielded speech segment of {len(speech_segment)} bytes. Sending to agent.")
+                        f"Client #{session_id}: VAD yielded speech segment of {len(speech_segment)} bytes from cleanup. Sending to agent.")
                     try:
-                        transcript = await transcribe_agent.transcribe_audio_chunk(speech_segment)
-                        if transcript:
-                            await websocket.send_json({
-                                "event": "transcript",
+                        transcript = await transcribe_segment(speech_segment)
+                        if transcript and capture_writer:
+                            capture_writer.record_transcript(transcript)
+                        if transcript and websocket.client_state == websocket.client_state.CONNECTED:
+                            event = {
+                                "event": "final_transcript",
                                 "session_id": session_id,
                                 "transcript": transcript,
                                 "audio_length_bytes": len(speech_segment)
-                            })
-                            print(f"Client #{session_id}: Sent transcript: \"{transcript}\"")
-                        else:
-                            print(f"Client #{session_id}: Agent returned empty transcript.")
-                    except Exception as e:
-                        print(f"Client #{session_id}: Error during transcription or sending: {e}")
-    except WebSocketDisconnect:
-        print(f"Client #{session_id} disconnected.")
-    except Exception as e:
-        print(f"Client #{session_id}: An unexpected error occurred: {e}")
-    finally:
-        print(f"Client #{session_id}: Cleaning up VAD resources...")
-        async for speech_segment in vad_handler.cleanup():
-            if speech_segment:
-                print(
-                    f"Client #{session_id}: VAD yielded speech segment of {len(speech_segment)} bytes from cleanup. Sending to agent.")
-                try:
-                    transcript = await transcribe_agent.transcribe_audio_chunk(speech_segment)
-                    if transcript and websocket.client_state == websocket.client_state.CONNECTED:
-                        await websocket.send_json({
-                            "event": "final_transcript",
-                            "session_id": session_id,
-                            "transcript": transcript,
-                            "audio_length_bytes": len(speech_segment)
-                        })
-                        print(f"Client #{session_id}: Sent final transcript from cleanup: \"{transcript}\"")
-                except Exception as e_clean:
-                    print(f"Client #{session_id}: Error during cleanup transcription/sending: {e_clean}")
+                            }
+                            if capture_writer:
+                                capture_writer.record_outbound_event(event)
+                            await websocket.send_json(event)
+                            print(f"Client #{session_id}: Sent final transcript from cleanup: \"{transcript}\"")
+                    except Exception as e_clean:
+                        print(f"Client #{session_id}: Error during cleanup transcription/sending: {e_clean}")
 
-        if websocket.client_state == websocket.client_state.CONNECTED:
-            await websocket.close(code=1000)
-        print(f"Client #{session_id} connection processing finished.")
+            if capture_writer:
+                capture_writer.close()
+            if websocket.client_state == websocket.client_state.CONNECTED:
+                await websocket.close(code=1000)
+            print(f"Client #{session_id} connection processing finished.")
+
+    # Transcription makes the same upstream calls as /discuss, so it is admitted the same way.
+    try:
+        async with upstream_scheduler.session(session_id):
+            await serve_session()
+    except SchedulerSaturatedError as e:
+        print(f"Client #{session_id}: {e}")
+        if capture_writer:
+            capture_writer.close()
+        await websocket.close(code=1013, reason="Server busy, try again later.")
 
 
 @router.websocket("/test/echo/{session_id}")
@@ -148,7 +287,11 @@ async def ws_echo_endpoint(
 @router.websocket("/test/vad/{session_id}")
 async def ws_vad_endpoint(
         websocket: WebSocket,
-        session_id: str
+        session_id: str,
+        sample_rate: int = SAMPLE_RATE,
+        channels: int = CHANNELS,
+        sample_format: str = TARGET_SAMPLE_FORMAT,
+        capture: bool = False
 ):
     await websocket.accept()
     print(f"VAD Client #{session_id} connected. Initializing VAD...")
@@ -156,26 +299,37 @@ async def ws_vad_endpoint(
         f"VAD Client #{session_id} Audio Config: SR={SAMPLE_RATE}, FrameDur={FRAME_DURATION_MS}ms, "
         f"Bytes/Frame={BYTES_PER_FRAME}, EOS Silence={SILENCE_DURATION_MS_EOS}ms"
     )
-    print(f"VAD Client #{session_id}: EXPECTING RAW PCM (16-bit, {SAMPLE_RATE}Hz, mono) from client.")
 
+    input_converter = await open_input_converter(websocket, session_id, sample_rate, channels, sample_format)
+    if input_converter is None:
+        return
+
+    capture_writer = open_capture(session_id, "vad", capture, input_converter)
     try:
-        vad_handler = VoiceActivityDetector(session_id)
+        vad_handler = VoiceActivityDetector(session_id, capture_writer)
     except Exception as e:
+        if capture_writer:
+            capture_writer.close()
         print(f"VAD Client #{session_id}: Critical error initializing VAD: {e}")
         await websocket.close(code=1011, reason=f"Server VAD initialization error: {e}")
         return
 
     try:
         while True:
-            raw_pcm_audio_chunk = await websocket.receive_bytes()
+            raw_audio_chunk = await websocket.receive_bytes()
 
-            if not raw_pcm_audio_chunk:
+            if not raw_audio_chunk:
                 print(f"VAD Client #{session_id}: Received empty data, continuing...")
                 continue
 
+            if capture_writer:
+                capture_writer.record_audio_in(raw_audio_chunk)
+            raw_pcm_audio_chunk = input_converter.convert(raw_audio_chunk)
             async for speech_segment in vad_handler.process_audio_chunk(raw_pcm_audio_chunk):
                 print("Speech found")
                 if speech_segment:
+                    if capture_writer:
+                        capture_writer.record_outbound_audio(speech_segment)
                     await websocket.send_bytes(speech_segment)
                     print(
                         f"VAD Client #{session_id}: Sent cleaned audio segment of {len(speech_segment)} bytes back to client.")
@@ -188,6 +342,8 @@ async def ws_vad_endpoint(
         print(f"VAD Client #{session_id}: Cleaning up VAD resources...")
         async for speech_segment in vad_handler.cleanup():
             if speech_segment and websocket.client_state == websocket.client_state.CONNECTED:
+                if capture_writer:
+                    capture_writer.record_outbound_audio(speech_segment)
                 await websocket.send_bytes(speech_segment)
                 print(
                     f"VAD Client #{session_id}: Sent final cleaned segment of {len(speech_segment)} bytes from cleanup.")
@@ -197,6 +353,8 @@ async def ws_vad_endpoint(
                     "cleaned_bytes": len(speech_segment)
                 })
 
+        if capture_writer:
+            capture_writer.close()
         if websocket.client_state == websocket.client_state.CONNECTED:
             await websocket.close(code=1000)
         print(f"VAD Client #{session_id} connection processing finished.")
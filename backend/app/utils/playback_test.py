@@ -0,0 +1,41 @@
+"""
+Dev-only: answers a question about the bundled paper and plays the audio on this machine's speakers.
+
+Kept out of the server's import graph because sounddevice needs PortAudio, which servers do not have.
+
+    pip install -r requirements-dev.txt
+    python -m app.utils.playback_test
+"""
+import asyncio
+
+import numpy as np
+import sounddevice as sd
+
+from app.agent.real_time_answer import answer_with_pdf
+from app.agent.transcription import PDF_PATH
+
+QUESTION = "what is the role of the decoder?? answer in one sentence"
+
+
+async def _playback_test():
+    async for part in answer_with_pdf(QUESTION, PDF_PATH):
+        text = part["text_chunk"]
+        audio_bytes = part["audio_chunk"]
+
+        # print the text chunk
+        print(text, end=" | ", flush=True)
+
+        # convert bytes to int16 numpy array
+        audio_array = np.frombuffer(audio_bytes, dtype=np.int16)
+
+        # normalize to float32 in [-1.0, 1.0]
+        audio_float = audio_array.astype(np.float32) / 32768.0
+
+        # play (non-blocking) and wait until done
+        sd.wait()
+        sd.play(audio_float, samplerate=24000)
+
+    print("\n[ALL DONE]")
+
+if __name__ == "__main__":
+    asyncio.run(_playback_test())
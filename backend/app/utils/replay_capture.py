@@ -0,0 +1,217 @@
+"""
+Replays a session capture recorded with `capture=true` on a /stream route.
+
+The captured client audio is fed back through AudioInputConverter, VoiceActivityDetector,
+TranscribeAgent.transcribe_audio_chunk and answer_with_pdf at the original pace (or
+faster), with Gemini and TTS replaced by stubs of configurable latency, and the time
+spent in each stage is reported.
+
+    python -m app.utils.replay_capture captures/discuss-123-20250101-120000.cap --speed 4
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+
+from app.agent.capture import CaptureReader, RECORD_AUDIO_IN, RECORD_META, RECORD_TRANSCRIPT, RECORD_VAD
+from app.agent.audio_input import AudioInputConverter, TARGET_SAMPLE_FORMAT
+from app.agent.outbound_constants import OUTPUT_BYTES_PER_SECOND
+from app.agent.base_agent import load_document_text
+from app.agent.real_time_answer import answer_with_pdf
+from app.agent.scaling_constants import SHARED_STATE_DIR_ENV
+from app.agent.shared_state import shared_store
+from app.agent.transcribe_agent import TranscribeAgent
+from app.agent.transcription import PDF_PATH
+from app.agent.vad import VoiceActivityDetector
+from app.agent.vad_constants import SAMPLE_RATE, CHANNELS
+
+STUB_ANSWER = (
+    "The decoder generates the output sequence one token at a time. "
+    "It attends to the encoder output and to the tokens it has already produced."
+)
+STUB_SPEAKING_CHARS_PER_S = 15  # used to size the stub TTS audio
+
+
+class StageTimings:
+    def __init__(self):
+        self.stages: dict[str, list[float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages.setdefault(stage, []).append(seconds)
+
+    def report(self) -> None:
+        print(f"\n{'stage':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total ms':>11}")
+        for stage, values in self.stages.items():
+            ordered = sorted(values)
+            pct = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+            print(
+                f"{stage:<22}{len(ordered):>7}{pct(0.5):>10.1f}{pct(0.95):>10.1f}"
+                f"{ordered[-1] * 1000:>10.1f}{sum(ordered) * 1000:>11.1f}"
+            )
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text]
+        self.candidates = []
+
+
+class ReplayTranscribeAgent(TranscribeAgent):
+    """TranscribeAgent whose upload/generate round trip is replaced by a fixed delay.
+
+    Answers with the transcripts recorded in the capture, in order.
+    """
+
+    def __init__(self, transcripts: list[str], latency_s: float):
+        self.model_name = "replay-stub"
+        self.prompt = ""
+        self.transcripts = transcripts
+        self.latency_s = latency_s
+        self.calls = 0
+
+    async def _transcribe_file(self, temp_file_path: str, uploaded_files: list[str]):
+        await asyncio.sleep(self.latency_s)
+        index = self.calls
+        self.calls += 1
+        if index < len(self.transcripts):
+            return _FakeResponse(self.transcripts[index])
+        return _FakeResponse(f"Replayed utterance {index + 1}.")
+
+
+class StubTTS:
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    async def synthesize(self, text: str, priority: int = 0) -> bytes:
+        await asyncio.sleep(self.latency_s)
+        return bytes(int(len(text) / STUB_SPEAKING_CHARS_PER_S * OUTPUT_BYTES_PER_SECOND) & ~1)
+
+
+def stub_agent_producer(first_token_latency_s: float, chunk_interval_s: float = 0.05):
+    async def producer(question: str, doc_text: str, queue_out: asyncio.Queue):
+        await asyncio.sleep(first_token_latency_s)
+        words = STUB_ANSWER.split(" ")
+        for i in range(0, len(words), 4):
+            await queue_out.put(" ".join(words[i:i + 4]) + " ")
+            await asyncio.sleep(chunk_interval_s)
+        await queue_out.put(None)
+
+    return producer
+
+
+def _audio_chunks(reader: CaptureReader):
+    """Yields (timestamp, bytes) for incoming audio, copying out of the mapping one chunk at a time."""
+    for record in reader:
+        if record.kind == RECORD_AUDIO_IN:
+            yield record.timestamp, bytes(record.payload)
+
+
+def _recorded_summary(reader: CaptureReader) -> tuple[dict, list[str], int]:
+    meta, transcripts, recorded_segments = {}, [], 0
+    for record in reader:
+        if record.kind == RECORD_META and not meta:
+            meta = record.json()
+        elif record.kind == RECORD_TRANSCRIPT:
+            transcripts.append(record.text())
+        elif record.kind == RECORD_VAD and record.json().get("event") == "speech_end":
+            recorded_segments += 1
+    return meta, transcripts, recorded_segments
+
+
+async def replay(args) -> None:
+    timings = StageTimings()
+    with CaptureReader(args.capture) as reader:
+        meta, transcripts, recorded_segments = _recorded_summary(reader)
+        print(f"Replay: {args.capture} ({meta.get('endpoint', '?')} session {meta.get('session_id', '?')}), "
+              f"{len(transcripts)} recorded transcripts, speed={'max' if args.speed <= 0 else f'{args.speed}x'}.")
+
+        converter = AudioInputConverter(
+            "replay",
+            meta.get("sample_rate", SAMPLE_RATE),
+            meta.get("channels", CHANNELS),
+            meta.get("sample_format", TARGET_SAMPLE_FORMAT)
+        )
+        vad = VoiceActivityDetector("replay")
+        if not args.no_answer:
+            # Parse the document up front so no stage timing includes the one-off PDF parse.
+            load_document_text(args.pdf)
+
+        agent = ReplayTranscribeAgent(transcripts, args.transcribe_latency_ms / 1000)
+        tts = StubTTS(args.tts_latency_ms / 1000)
+        producer = stub_agent_producer(args.agent_latency_ms / 1000)
+        replayed_segments = 0
+
+        async def handle_segment(segment: bytes, end_of_speech: float):
+            start = time.monotonic()
+            transcript = await agent.transcribe_audio_chunk(segment)
+            timings.add("transcribe", time.monotonic() - start)
+            if args.no_answer or not transcript:
+                return
+
+            answer_start = time.monotonic()
+            first_audio = None
+            async for part in answer_with_pdf(transcript, args.pdf, tts=tts, producer=producer):
+                if first_audio is None and part["audio_chunk"]:
+                    first_audio = time.monotonic()
+                    timings.add("answer_first_audio", first_audio - answer_start)
+                    timings.add("eos_to_first_audio", first_audio - end_of_speech)
+            timings.add("answer_total", time.monotonic() - answer_start)
+
+        replay_start = time.monotonic()
+        first_timestamp = None
+        for timestamp, chunk in _audio_chunks(reader):
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if args.speed > 0:
+                due = replay_start + (timestamp - first_timestamp) / args.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    timings.add("feed_lag", -delay)
+
+            start = time.monotonic()
+            pcm = converter.convert(chunk)
+            timings.add("convert", time.monotonic() - start)
+
+            start = time.monotonic()
+            segments = [segment async for segment in vad.process_audio_chunk(pcm)]
+            end_of_speech = time.monotonic()
+            timings.add("vad", end_of_speech - start)
+
+            for segment in segments:
+                replayed_segments += 1
+                await handle_segment(bytes(segment), end_of_speech)
+
+        async for segment in vad.cleanup():
+            replayed_segments += 1
+            await handle_segment(bytes(segment), time.monotonic())
+
+    print(f"\nReplay: {replayed_segments} speech segments (capture recorded {recorded_segments}), "
+          f"wall time {time.monotonic() - replay_start:.2f}s.")
+    timings.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a /stream session capture with stubbed upstreams.")
+    parser.add_argument("capture", help="Path to a .cap file")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed factor; 0 feeds as fast as possible")
+    parser.add_argument("--transcribe-latency-ms", type=float, default=300.0)
+    parser.add_argument("--agent-latency-ms", type=float, default=400.0, help="Stub agent time to first text")
+    parser.add_argument("--tts-latency-ms", type=float, default=150.0)
+    parser.add_argument("--pdf", default=PDF_PATH, help="Document passed to answer_with_pdf")
+    parser.add_argument("--no-answer", action="store_true", help="Stop after transcription")
+    args = parser.parse_args()
+
+    # A private, empty shared state directory: replay neither reads caches left by earlier
+    # runs nor writes into the one the server's workers use.
+    with tempfile.TemporaryDirectory(prefix="replay-state-") as state_dir:
+        os.environ[SHARED_STATE_DIR_ENV] = state_dir
+        shared_store.cache_clear()
+        asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
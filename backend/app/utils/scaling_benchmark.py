@@ -0,0 +1,444 @@
+"""
+Measures session capacity of the multi-worker deployment as workers are added.
+
+For each worker count the deployment is started with `app.multiworker`, and real-time
+sessions are run through the affinity router in steps: RAMP_FACTOR more sessions per step
+until a step misses its service levels, then REFINE_STEPS bisections between the last step
+that met them and the first that did not. A step that misses is run once more before it
+counts. Capacity is the most sessions that met them.
+
+- vad: sessions stream synthetic speech (48 kHz mono, so every chunk is resampled) to
+  /stream/test/vad at real-time pace. A step passes if no session was dropped and the
+  p95 time from the end-of-speech silence being sent to the segment coming back is
+  within VAD_LATENCY_BUDGET_S.
+- discuss: sessions hold a conversation on /stream/discuss of `app.utils.stub_upstreams`,
+  which answers through the production answer path with the upstreams stubbed. Each
+  session waits for the answer to finish and a short pause before asking again. A step
+  passes if no session was shed or left unanswered, the p95 time from question to first
+  answer audio is within FIRST_AUDIO_BUDGET_S and the p99 gap between answer frames is
+  within the outbound lead (beyond it the client's playback buffer runs dry). The workers
+  share a fresh state directory whose document text is extracted before the first step.
+  The stub app lifts session admission, so this is what the host sustains; in production
+  admission also caps each worker at MAX_ACTIVE_SESSIONS.
+
+The CPU used by the router (the launcher process, which copies every byte of every
+session) and by the workers is read from /proc during each step and reported in cores.
+
+Scaling efficiency for N workers is capacity(N) / (capacity(1) * min(N, cores)); a host
+with fewer cores than workers cannot do better than its core count. The load generator
+runs on the same host, so leave it cores of its own on a real measurement.
+
+    python -m app.utils.scaling_benchmark --workers 1,2,4
+    python -m app.utils.scaling_benchmark --workers 1,2,4 --scenario discuss
+
+Exits non-zero if any efficiency is below --min-efficiency.
+"""
+import os
+import sys
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from app.agent.base_agent import load_document_text, _load_document_text
+from app.agent.outbound_constants import OUTPUT_BYTES_PER_SECOND, OUTBOUND_LEAD_MS
+from app.agent.scaling_constants import WORKER_BASE_PORT, SHARED_STATE_DIR_ENV
+from app.agent.scheduler_constants import MAX_ACTIVE_SESSIONS
+from app.agent.shared_state import shared_store
+from app.agent.transcription import PDF_PATH
+from app.agent.vad_constants import SILENCE_DURATION_MS_EOS
+from app.utils.replay_capture import STUB_ANSWER, STUB_SPEAKING_CHARS_PER_S
+
+SCENARIOS = ("vad", "discuss")
+START_SESSIONS_PER_WORKER = 4
+RAMP_FACTOR = 1.5
+REFINE_STEPS = 2
+MAX_SESSIONS_PER_WORKER = 512
+WINDOW_S = 15.0
+SETTLE_S = 3.0  # between steps, so the previous step's sessions have closed
+MISS_RETRIES = 1  # a step missed once may be an unrelated stall on the host; it must miss again
+MIN_SCALING_EFFICIENCY = 0.8
+
+# Service levels a step must meet.
+VAD_LATENCY_BUDGET_S = 0.5
+FIRST_AUDIO_BUDGET_S = 1.5
+AUDIO_GAP_BUDGET_S = OUTBOUND_LEAD_MS / 1000
+
+INPUT_SAMPLE_RATE = 48000
+CHUNK_MS = 100
+SPEECH_S = 1.5
+PAUSE_S = 1.0  # longer than the VAD's end-of-speech silence, so each burst comes back as one segment
+ANSWER_BYTES = int(len(STUB_ANSWER) / STUB_SPEAKING_CHARS_PER_S * OUTPUT_BYTES_PER_SECOND)
+QUESTION_BYTES = 3200  # 100 ms of 16 kHz silence; /discuss answers any chunk with the same question
+QUIET_S = 0.5  # no answer audio for this long (and most of it received) means the answer is over
+THINK_S = (0.5, 1.5)  # pause before the next question, drawn per question
+STARTUP_TIMEOUT_S = 30.0
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _speech_cycle() -> list[bytes]:
+    """One burst of speech-like audio and a pause, as CHUNK_MS chunks of 48 kHz int16."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(INPUT_SAMPLE_RATE * SPEECH_S)) / INPUT_SAMPLE_RATE
+    speech = 0.3 * np.sin(2 * np.pi * 200 * t) * np.sin(2 * np.pi * 3 * t) + 0.05 * rng.standard_normal(len(t))
+    audio = np.concatenate([speech, np.zeros(int(INPUT_SAMPLE_RATE * PAUSE_S))])
+    pcm = (audio * 32767).astype(np.int16).tobytes()
+    chunk_bytes = int(INPUT_SAMPLE_RATE * CHUNK_MS / 1000) * 2
+    return [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+
+async def _run_until(end: float, *coroutines) -> None:
+    tasks = [asyncio.create_task(c) for c in coroutines]
+    await asyncio.sleep(max(0.0, end - time.monotonic()))
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _vad_session(url: str, chunks: list[bytes], start_at: float, window_s: float) -> dict:
+    import websockets
+
+    result = {"failed": False, "latencies": [], "gaps": []}
+    ready_at: deque[float] = deque()  # when each burst's segment is due back, oldest first
+    try:
+        async with websockets.connect(url, max_size=None, close_timeout=2) as ws:
+            await asyncio.sleep(max(0.0, start_at - time.time()))
+            start = time.monotonic()
+            end = start + window_s
+
+            async def send():
+                # Scheduled at real-time pace; latency counts from the schedule, so a server
+                # that cannot take the audio as fast as it is spoken shows up as latency.
+                k = 0
+                while True:
+                    due = start + k * CHUNK_MS / 1000
+                    await asyncio.sleep(max(0.0, due - time.monotonic()))
+                    if k % len(chunks) == 0:
+                        ready_at.append(due + SPEECH_S + SILENCE_DURATION_MS_EOS / 1000)
+                    await ws.send(chunks[k % len(chunks)])
+                    k += 1
+
+            async def receive():
+                try:
+                    async for message in ws:
+                        if isinstance(message, bytes) and ready_at:
+                            result["latencies"].append(time.monotonic() - ready_at.popleft())
+                except websockets.ConnectionClosed:
+                    pass
+                if time.monotonic() < end:
+                    result["failed"] = True
+
+            await _run_until(end, send(), receive())
+    except (OSError, websockets.WebSocketException):
+        result["failed"] = True
+        return result
+    # Segments still outstanding at the end were late by at least this much.
+    result["latencies"] += [end - due for due in ready_at if due < end]
+    return result
+
+
+async def _discuss_session(url: str, start_at: float, window_s: float) -> dict:
+    import websockets
+
+    rng = random.Random(url)  # think times differ between sessions but not between runs
+    result = {"failed": False, "latencies": [], "gaps": []}
+    state = {"last": None, "since_question": 0, "asked": None}
+    try:
+        async with websockets.connect(url, max_size=None, close_timeout=2) as ws:
+            await asyncio.sleep(max(0.0, start_at - time.time()))
+            end = time.monotonic() + window_s
+
+            async def receive():
+                try:
+                    async for message in ws:
+                        if not isinstance(message, bytes):
+                            continue
+                        now = time.monotonic()
+                        if state["asked"] is not None:
+                            if state["since_question"] == 0:
+                                result["latencies"].append(now - state["asked"])
+                            else:
+                                result["gaps"].append(now - state["last"])
+                        state["last"] = now
+                        state["since_question"] += len(message)
+                except websockets.ConnectionClosed:
+                    pass
+                if time.monotonic() < end:
+                    result["failed"] = True
+
+            async def ask():
+                expected = 0  # the greeting: any length
+                while True:
+                    while not (
+                            state["last"] is not None and state["since_question"] >= expected
+                            and time.monotonic() - state["last"] >= QUIET_S
+                    ):
+                        await asyncio.sleep(0.05)
+                    await asyncio.sleep(rng.uniform(*THINK_S))
+                    await ws.send(bytes(QUESTION_BYTES))
+                    state["asked"] = time.monotonic()
+                    state["since_question"] = 0
+                    expected = int(ANSWER_BYTES * 0.9)
+
+            await _run_until(end, ask(), receive())
+    except (OSError, websockets.WebSocketException):
+        result["failed"] = True
+        return result
+    if state["asked"] is not None and state["since_question"] == 0:
+        result["latencies"].append(end - state["asked"])  # still waiting: late by at least this much
+    return result
+
+
+def _client_process(base_url: str, scenario: str, session_ids: list[str], start_at: float, window_s: float) -> list[dict]:
+    async def run():
+        if scenario == "discuss":
+            return await asyncio.gather(*(
+                _discuss_session(f"{base_url}/stream/discuss/{session_id}", start_at, window_s)
+                for session_id in session_ids
+            ))
+        chunks = _speech_cycle()
+        return await asyncio.gather(*(
+            _vad_session(f"{base_url}/stream/test/vad/{session_id}?sample_rate={INPUT_SAMPLE_RATE}",
+                         chunks, start_at, window_s)
+            for session_id in session_ids
+        ))
+
+    return asyncio.run(run())
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_health(port: int, workers: int, process: subprocess.Popen) -> None:
+    # Every worker must answer, not just the first: poll each worker port directly. The
+    # router comes last: a request it forwards to a worker that is still starting marks
+    # that worker down, and its sessions would all land on the others.
+    deadline = time.monotonic() + STARTUP_TIMEOUT_S
+    for ports in ({WORKER_BASE_PORT + i for i in range(workers)}, {port}):
+        pending = set(ports)
+        while pending:
+            if process.poll() is not None:
+                raise RuntimeError(f"app.multiworker exited with code {process.returncode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"ports {sorted(pending)} not healthy within {STARTUP_TIMEOUT_S}s")
+            for p in list(pending):
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{p}/health", timeout=1) as response:
+                        if response.status == 200:
+                            pending.discard(p)
+                except OSError:
+                    pass
+            time.sleep(0.1)
+
+
+def _cpu_seconds(pid: int) -> float | None:
+    """User + system CPU time of `pid`, from /proc (None where there is no /proc)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _children(pid: int) -> list[int]:
+    children = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except OSError:
+                pass
+    return children
+
+
+def _cpu_sample(router_pid: int) -> tuple[float | None, float | None]:
+    """CPU seconds used so far by the router and by all of its workers."""
+    worker_times = [_cpu_seconds(pid) for pid in _children(router_pid)]
+    worker_total = sum(t for t in worker_times if t is not None) if worker_times else None
+    return _cpu_seconds(router_pid), worker_total
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return math.inf
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+@contextmanager
+def deployment(scenario: str, workers: int):
+    """Starts `workers` workers behind the router; yields the router's port and process."""
+    port = _free_port()
+    command = [sys.executable, "-m", "app.multiworker", "--workers", str(workers), "--host", "127.0.0.1",
+               "--port", str(port), "--quiet"]
+    if scenario == "discuss":
+        command += ["--app", "app.utils.stub_upstreams:app"]
+    with tempfile.TemporaryDirectory(prefix="scaling-state-") as state_dir:
+        env = {**os.environ, "STARTUP_WARMUP": "0", SHARED_STATE_DIR_ENV: state_dir}
+        if scenario == "discuss":
+            # Extract the document into the workers' store now rather than inside a step.
+            os.environ[SHARED_STATE_DIR_ENV] = state_dir
+            shared_store.cache_clear()
+            _load_document_text.cache_clear()
+            load_document_text(PDF_PATH)
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+        try:
+            _wait_for_health(port, workers, process)
+            yield port, process
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def run_step(scenario: str, port: int, router_pid: int, sessions: int, window_s: float,
+             client_procs: int, step: int) -> dict:
+    session_ids = [f"bench-{step}-{i}" for i in range(sessions)]
+    groups = [group for group in (session_ids[i::client_procs] for i in range(client_procs)) if group]
+    start_at = time.time() + 2.0 + sessions / 200  # time for every client process to start and connect
+    with ProcessPoolExecutor(len(groups)) as pool:
+        futures = [
+            pool.submit(_client_process, f"ws://127.0.0.1:{port}", scenario, group, start_at, window_s)
+            for group in groups
+        ]
+        time.sleep(max(0.0, start_at - time.time()))
+        router_before, workers_before = _cpu_sample(router_pid)
+        time.sleep(window_s)
+        router_after, workers_after = _cpu_sample(router_pid)
+        results = [result for future in futures for result in future.result()]
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    gaps = [gap for result in results for gap in result["gaps"]]
+    failed = sum(1 for result in results if result["failed"] or not result["latencies"])
+    p95_latency = _percentile(latencies, 0.95)
+    p99_gap = _percentile(gaps, 0.99) if gaps else 0.0
+    budget = FIRST_AUDIO_BUDGET_S if scenario == "discuss" else VAD_LATENCY_BUDGET_S
+    cores = lambda before, after: None if before is None or after is None else (after - before) / window_s
+    return {
+        "sessions": sessions,
+        "ok": failed == 0 and p95_latency <= budget and p99_gap <= AUDIO_GAP_BUDGET_S,
+        "failed": failed,
+        "p95_latency": p95_latency,
+        "p99_gap": p99_gap,
+        "router_cores": cores(router_before, router_after),
+        "worker_cores": cores(workers_before, workers_after),
+    }
+
+
+def _format_cores(value: float | None) -> str:
+    return "n/a" if value is None else f"{value:.2f}"
+
+
+def _print_step(scenario: str, workers: int, stats: dict) -> None:
+    latency = "first audio" if scenario == "discuss" else "segment"
+    gap = f", p99 frame gap {stats['p99_gap'] * 1000:.0f}ms" if scenario == "discuss" else ""
+    print(f"  {workers} workers, {stats['sessions']:>4} sessions: {'ok  ' if stats['ok'] else 'MISS'} "
+          f"{stats['failed']} dropped, p95 {latency} {stats['p95_latency'] * 1000:.0f}ms{gap}, "
+          f"router {_format_cores(stats['router_cores'])} cores, workers {_format_cores(stats['worker_cores'])} cores")
+
+
+def measure_capacity(scenario: str, workers: int, window_s: float, client_procs: int,
+                     max_sessions_per_worker: int = MAX_SESSIONS_PER_WORKER) -> dict | None:
+    """Stats of the largest step that met the service levels, or None if the first did not."""
+    with deployment(scenario, workers) as (port, process):
+        best, first_miss, step = None, None, 0
+
+        def run(sessions: int) -> dict:
+            nonlocal step
+            for _ in range(MISS_RETRIES + 1):
+                step += 1
+                if step > 1:
+                    time.sleep(SETTLE_S)
+                stats = run_step(scenario, port, process.pid, sessions, window_s, client_procs, step)
+                _print_step(scenario, workers, stats)
+                if stats["ok"]:
+                    break
+            return stats
+
+        sessions = START_SESSIONS_PER_WORKER * workers
+        while sessions <= max_sessions_per_worker * workers:
+            stats = run(sessions)
+            if not stats["ok"]:
+                first_miss = sessions
+                break
+            best = stats
+            sessions = math.ceil(sessions * RAMP_FACTOR)
+
+        for _ in range(REFINE_STEPS):
+            low = best["sessions"] if best else 0
+            if first_miss is None or first_miss - low <= 1:
+                break
+            stats = run((low + first_miss) // 2)
+            if stats["ok"]:
+                best = stats
+            else:
+                first_miss = stats["sessions"]
+        if best is not None:
+            best["capped"] = first_miss is None  # never missed: capacity is only a lower bound
+        return best
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Benchmark session capacity from 1 to N workers.")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, cores})),
+                        help="Comma-separated worker counts; must include 1")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="vad")
+    parser.add_argument("--window-s", type=float, default=WINDOW_S, help="Length of each step")
+    parser.add_argument("--max-sessions-per-worker", type=int, default=MAX_SESSIONS_PER_WORKER)
+    parser.add_argument("--client-procs", type=int, default=max(1, cores // 2),
+                        help="Load generator processes; they share the host with the workers")
+    parser.add_argument("--min-efficiency", type=float, default=MIN_SCALING_EFFICIENCY)
+    args = parser.parse_args()
+
+    counts = sorted({int(n) for n in args.workers.split(",")} | {1})
+    print(f"Host has {cores} cores; {args.scenario} scenario, {args.window_s:.0f}s steps.")
+    capacities = {}
+    for n in counts:
+        capacities[n] = measure_capacity(args.scenario, n, args.window_s, args.client_procs,
+                                         args.max_sessions_per_worker)
+        if capacities[1] is None:
+            print("FAIL: one worker did not meet the service levels at the first step.")
+            sys.exit(1)
+
+    print(f"\n{'workers':>8}{'capacity':>10}{'speedup':>10}{'efficiency':>12}{'router cores':>14}{'worker cores':>14}")
+    baseline = capacities[1]["sessions"]
+    failures = []
+    for n, stats in capacities.items():
+        capacity = stats["sessions"] if stats else 0
+        shown = f"{'>=' if stats and stats['capped'] else ''}{capacity}"
+        speedup = capacity / baseline
+        efficiency = speedup / min(n, cores)
+        router = _format_cores(stats["router_cores"]) if stats else "-"
+        worker = _format_cores(stats["worker_cores"]) if stats else "-"
+        print(f"{n:>8}{shown:>10}{speedup:>9.2f}x{efficiency:>11.0%}{router:>14}{worker:>14}")
+        if efficiency < args.min_efficiency:
+            failures.append(n)
+
+    if any(stats and stats["capped"] for stats in capacities.values()):
+        print("'>=': no step missed up to --max-sessions-per-worker, so the speedups are not meaningful.")
+    if args.scenario == "discuss":
+        print(f"Admission lifted; in production each worker also stops at {MAX_ACTIVE_SESSIONS} sessions.")
+    if failures:
+        print(f"FAIL: efficiency below {args.min_efficiency:.0%} for {', '.join(map(str, failures))} workers")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
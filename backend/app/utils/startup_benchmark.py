@@ -0,0 +1,127 @@
+"""
+Measures server startup and fails if it is over budget.
+
+Two numbers are taken, each in a fresh interpreter so nothing is already imported:
+  * import time of `app.main`, which must also leave the heavy SDKs unimported;
+  * time from spawning uvicorn to the first successful GET /health.
+
+    python -m app.utils.startup_benchmark --runs 5
+
+Exits non-zero if the median of either number exceeds its budget.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+IMPORT_BUDGET_S = 1.0
+FIRST_HEALTH_BUDGET_S = 2.5
+HEALTH_POLL_INTERVAL_S = 0.02
+HEALTH_TIMEOUT_S = 30.0
+
+# Must not be imported by `import app.main`; they load lazily or in the background warm-up.
+HEAVY_MODULES = (
+    "google.generativeai",
+    "google.cloud.texttospeech",
+    "google.adk",
+    "google.genai",
+    "pypdf",
+    "sounddevice",
+    "numpy",  # only needed once a client sends audio that must be converted
+)
+
+_IMPORT_PROBE = f"""
+import sys, json, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure_import() -> tuple[float, list[str]]:
+    # Warm-up is a lifespan hook, so it cannot run here; disable it anyway for a clean number.
+    env = {**os.environ, "STARTUP_WARMUP": "0"}
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["elapsed"], result["heavy"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_health() -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < HEALTH_TIMEOUT_S:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode} before serving /health")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(HEALTH_POLL_INTERVAL_S)
+        raise RuntimeError(f"/health did not answer within {HEALTH_TIMEOUT_S}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server import time and time to first /health.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-s", type=float, default=IMPORT_BUDGET_S)
+    parser.add_argument("--health-budget-s", type=float, default=FIRST_HEALTH_BUDGET_S)
+    args = parser.parse_args()
+
+    import_times, health_times, heavy = [], [], set()
+    for _ in range(args.runs):
+        elapsed, loaded = measure_import()
+        import_times.append(elapsed)
+        heavy.update(loaded)
+        health_times.append(measure_first_health())
+
+    import_median = statistics.median(import_times)
+    health_median = statistics.median(health_times)
+    print(f"import app.main: median {import_median * 1000:.0f}ms, max {max(import_times) * 1000:.0f}ms "
+          f"(budget {args.import_budget_s * 1000:.0f}ms)")
+    print(f"spawn -> first /health: median {health_median * 1000:.0f}ms, max {max(health_times) * 1000:.0f}ms "
+          f"(budget {args.health_budget_s * 1000:.0f}ms)")
+
+    failures = []
+    if heavy:
+        failures.append(f"heavy modules imported at startup: {', '.join(sorted(heavy))}")
+    if import_median > args.import_budget_s:
+        failures.append("import time over budget")
+    if health_median > args.health_budget_s:
+        failures.append("time to first /health over budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
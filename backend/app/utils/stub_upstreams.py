@@ -0,0 +1,53 @@
+"""
+The server app with Gemini, the live agent and TTS replaced by the replay stubs, for load tests.
+
+Everything between the socket and the upstreams runs as in production: outbound pacing, the shared document text, the shared TTS cache and the session store. The
+stubs take no upstream scheduler slots, and session admission is lifted: both are sized
+for the real upstream quota, and a load test should find what the host sustains instead.
+
+    python -m app.multiworker --workers 4 --app app.utils.stub_upstreams:app
+
+Every answer is the same canned text; never serve this app to users.
+"""
+from functools import partial
+
+from app.main import app
+from app.agent import transcription
+from app.agent.real_time_answer import answer_with_pdf
+from app.agent.scheduler_constants import PRIORITY_TTS
+from app.agent.shared_state import shared_store
+from app.agent.upstream_scheduler import upstream_scheduler
+from app.routes.stream import get_transcribe_agent
+from app.utils.replay_capture import ReplayTranscribeAgent, StubTTS, stub_agent_producer
+
+STUB_TRANSCRIBE_LATENCY_S = 0.3
+STUB_AGENT_LATENCY_S = 0.4  # time to first text
+STUB_TTS_LATENCY_S = 0.15
+STUB_MAX_ACTIVE_SESSIONS = 100_000
+
+
+class CachedStubTTS(StubTTS):
+    """StubTTS behind the same shared cache as TTSStreamer, so repeated sentences skip the stub."""
+
+    def __init__(self, latency_s: float):
+        super().__init__(latency_s)
+        self.cache = shared_store("tts")
+
+    async def synthesize(self, text: str, priority: int = PRIORITY_TTS) -> bytes:
+        cache_key = "stub|" + text
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        audio = await super().synthesize(text, priority)
+        self.cache.put(cache_key, audio)
+        return audio
+
+
+transcription.TTSStreamer = partial(CachedStubTTS, STUB_TTS_LATENCY_S)
+transcription.answer_with_pdf = partial(
+    answer_with_pdf,
+    tts=CachedStubTTS(STUB_TTS_LATENCY_S),
+    producer=stub_agent_producer(STUB_AGENT_LATENCY_S)
+)
+upstream_scheduler.max_active_sessions = STUB_MAX_ACTIVE_SESSIONS
+app.dependency_overrides[get_transcribe_agent] = lambda: ReplayTranscribeAgent([], STUB_TRANSCRIBE_LATENCY_S)
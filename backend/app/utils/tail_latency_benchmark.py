@@ -0,0 +1,88 @@
+"""
+Compares tail latency with and without call_with_deadline against a local fake upstream.
+
+The fake server answers in ~40 ms, but a few percent of requests stall for 1.5 s, the way
+a TTS or Gemini call occasionally does. The same load is sent with plain calls and with a
+deadline and hedging, and p50/p95/p99 are printed for both.
+
+    python -m app.utils.tail_latency_benchmark
+"""
+import time
+import random
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+from app.agent.tail_latency import CallPolicy, call_with_deadline, run_blocking
+
+
+class _SpikyHandler(BaseHTTPRequestHandler):
+    """Answers after ~40 ms, but a few percent of requests stall for 1.5 s."""
+
+    spike_probability = 0.03
+
+    def do_GET(self):
+        delay = 1.5 if random.random() < self.spike_probability else random.uniform(0.03, 0.05)
+        time.sleep(delay)
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def _run_load(url: str, policy: CallPolicy | None, num_requests: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    def blocking_get():
+        with urlopen(url, timeout=10) as response:
+            return response.read()
+
+    async def attempt():
+        return await run_blocking(blocking_get)
+
+    async def one():
+        async with semaphore:
+            start = time.monotonic()
+            if policy is None:
+                await attempt()
+            else:
+                await call_with_deadline("fake", attempt, policy)
+            latencies.append(time.monotonic() - start)
+
+    await asyncio.gather(*(one() for _ in range(num_requests)))
+    return sorted(latencies)
+
+
+async def _benchmark(num_requests: int = 600, concurrency: int = 8):
+    random.seed(0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SpikyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/synthesize"
+
+    try:
+        for label, policy in (
+                ("plain", None),
+                ("deadline+hedge", CallPolicy(deadline_s=3.0)),
+        ):
+            latencies = await _run_load(url, policy, num_requests, concurrency)
+            pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+            print(
+                f"{label:<15} n={len(latencies)} p50={pct(0.5):.0f}ms p95={pct(0.95):.0f}ms "
+                f"p99={pct(0.99):.0f}ms max={latencies[-1] * 1000:.0f}ms"
+            )
+    finally:
+        server.shutdown()
+
+
+def main():
+    asyncio.run(_benchmark())
+
+
+if __name__ == "__main__":
+    main()
@@ -158,9 +158,7 @@ function schedulePcmChunk(pcmArrayBuffer: ArrayBuffer, sampleRate: number) {
 
   sourceNode.onended = () => {
     totalScheduledDuration -= chunkDuration;
-    if (audioQueue.length > 0) {
-        playNextInQueue(sampleRate); // Proactively play next if available
-    } else if (totalScheduledDuration < MIN_CHUNK_DURATION_TO_SCHEDULE) { // Check if queue is effectively empty
+    if (totalScheduledDuration < MIN_CHUNK_DURATION_TO_SCHEDULE) { // Nothing left scheduled after this chunk
         isPlayingScheduledAudio = false;
         nextChunkStartTime = 0;
         totalScheduledDuration = 0;
@@ -175,9 +173,9 @@ function schedulePcmChunk(pcmArrayBuffer: ArrayBuffer, sampleRate: number) {
 function enqueueAndPlayAudio(pcmArrayBuffer: ArrayBuffer, sampleRate: number) {
   if (pcmArrayBuffer.byteLength === 0) return;
   audioQueue.push(pcmArrayBuffer);
-  if (!isPlayingScheduledAudio) {
-    playNextInQueue(sampleRate);
-  }
+  // Schedule on arrival, not from the previous chunk's onended: the server sends short
+  // frames, and waiting for onended would leave a gap between every pair of them.
+  playNextInQueue(sampleRate);
 }
 
 function playNextInQueue(sampleRate: number) {
@@ -189,12 +187,12 @@ function playNextInQueue(sampleRate: number) {
     return;
   }
   isPlayingScheduledAudio = true;
-  const chunkToPlay = audioQueue.shift();
-  if (chunkToPlay) {
-    schedulePcmChunk(chunkToPlay, sampleRate);
-  } else {
-     // This case should ideally not be hit if length > 0 check is done
-     isPlayingScheduledAudio = false;
+  // Each chunk starts at nextChunkStartTime, so queued chunks play back to back.
+  while (audioQueue.length > 0) {
+    const chunkToPlay = audioQueue.shift();
+    if (chunkToPlay) {
+      schedulePcmChunk(chunkToPlay, sampleRate);
+    }
   }
 }
 